@@ -0,0 +1,314 @@
+import { Alert, Autocomplete, Badge, Button, Checkbox, Group, Loader, MantineProvider, Stack, Text } from '@mantine/core';
+import { useCallback, useEffect, useMemo, useState } from 'react';
+import { createRoot } from 'react-dom/client';
+
+import type { PluginRenderData } from './types';
+
+// Item table of the loan detail page for large loans (see LoanDetailView / loan_detail.html).
+// Items are fetched in keyset pages from the JSON API and only the visible rows are rendered.
+// Issue / return actions change the rows at once and are reconciled with the server response.
+
+type LoanedItem = {
+  pk: number;
+  stock_item: number;
+  serial: string | null;
+  part_name: string;
+  status: string;
+  busy?: boolean; // Action sent, waiting for the server
+};
+
+type PanelConfig = {
+  loan: number;
+  loan_open: boolean; // Not RETURNED / CANCELLED - pending items can be issued
+  items_total: number;
+  items_url: string;
+  issue_url: string;
+  return_url: string;
+  location_search_url: string;
+  stock_item_url: string; // Contains '/0/' as placeholder for the StockItem pk
+  csrf_token: string;
+};
+
+type Location = { pk: number; name: string; pathstring: string };
+
+// POST body of the issue / return endpoints (api.LoanIssue / api.LoanReturn)
+type ActionBody = { items: number[]; location?: number };
+
+// Their response: new item statuses, or the background job which took over
+type ActionResponse = {
+  items?: Record<string, string>;
+  job?: number;
+  progress_url?: string;
+  error?: string;
+};
+
+// Rows per API request, row height (px) and extra rows rendered above / below the viewport
+const PAGE_SIZE = 500;
+const ROW_HEIGHT = 36;
+const VIEWPORT_HEIGHT = 600;
+const OVERSCAN = 10;
+
+const STATUS_COLORS: Record<string, string> = {
+  PENDING: 'blue',
+  ON_LOAN: 'orange',
+  RETURNED: 'green',
+};
+
+// Attempts per action when the request doesn't reach the server (network error)
+const POST_ATTEMPTS = 3;
+
+// crypto.randomUUID() only exists in secure contexts (HTTPS / localhost), getRandomValues() everywhere
+function newIdempotencyKey(): string {
+  if (typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// One key per action, reused by every attempt - a retried request is answered from the server's record
+async function postJson(url: string, body: ActionBody, csrfToken: string): Promise<ActionResponse> {
+  const idempotencyKey = newIdempotencyKey();
+  for (let attempt = 1; ; attempt++) {
+    let response: Response;
+    try {
+      response = await fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken, 'Idempotency-Key': idempotencyKey },
+        body: JSON.stringify(body),
+      });
+    } catch (e) {
+      // Network error - the action may or may not have run, the same key makes retrying safe
+      if (attempt >= POST_ATTEMPTS) {
+        throw e;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * attempt));
+      continue;
+    }
+    const data: ActionResponse = await response.json();
+    if (!response.ok) {
+      throw new Error(data?.error ?? `HTTP ${response.status}`);
+    }
+    return data;
+  }
+}
+
+// Polls a background job (LoanJobProgressView) until it is finished
+async function waitForJob(progressUrl: string) {
+  while (true) {
+    await new Promise((resolve) => setTimeout(resolve, 2000));
+    const job = await (await fetch(progressUrl, { credentials: 'same-origin' })).json();
+    if (job.status !== 'QUEUED' && job.status !== 'RUNNING') {
+      return job;
+    }
+  }
+}
+
+function LoanDetailPanel({ config }: { config: PanelConfig }) {
+  const [items, setItems] = useState<LoanedItem[]>([]);
+  const [loading, setLoading] = useState<boolean>(true);
+  const [error, setError] = useState<string | null>(null);
+  const [selected, setSelected] = useState<Set<number>>(new Set());
+  const [scrollTop, setScrollTop] = useState<number>(0);
+
+  const [locationTerm, setLocationTerm] = useState<string>('');
+  const [locations, setLocations] = useState<Location[]>([]);
+  const location = locations.find((loc) => loc.pathstring === locationTerm);
+
+  // Load all items page by page, the table is usable after the first page
+  useEffect(() => {
+    let cancelled = false;
+
+    async function load() {
+      let after = 0;
+      while (!cancelled) {
+        const response = await fetch(`${config.items_url}?after=${after}&limit=${PAGE_SIZE}`, { credentials: 'same-origin' });
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+        const data = await response.json();
+        if (cancelled) {
+          return;
+        }
+        setItems((current) => current.concat(data.results));
+        if (data.next === null) {
+          break;
+        }
+        after = data.next;
+      }
+      setLoading(false);
+    }
+
+    load().catch((e) => {
+      setError(String(e));
+      setLoading(false);
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [config.items_url]);
+
+  // Location search for the return picker (debounced)
+  useEffect(() => {
+    const term = locationTerm.trim();
+    if (term.length < 2 || location) {
+      return;
+    }
+    const timer = setTimeout(() => {
+      fetch(`${config.location_search_url}?q=${encodeURIComponent(term)}`, { credentials: 'same-origin' })
+        .then((response) => response.json())
+        .then((data) => setLocations(data.results));
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [locationTerm, location, config.location_search_url]);
+
+  // Sets status / busy flag of the given items, keeping all other rows as they are
+  const updateItems = useCallback((pks: number[], change: (item: LoanedItem) => LoanedItem) => {
+    const targets = new Set(pks);
+    setItems((current) => current.map((item) => (targets.has(item.pk) ? change(item) : item)));
+  }, []);
+
+  // Optimistic action: show the new status at once, then apply what the server reports
+  const runAction = useCallback(
+    async (pks: number[], newStatus: string, url: string, body: ActionBody) => {
+      if (!pks.length) {
+        return;
+      }
+      setError(null);
+      const previous = new Map(items.filter((item) => pks.includes(item.pk)).map((item) => [item.pk, item.status]));
+      updateItems(pks, (item) => ({ ...item, status: newStatus, busy: true }));
+
+      try {
+        const data = await postJson(url, body, config.csrf_token);
+        if (data.job && data.progress_url) {
+          // Large action - handed to the background worker, rows stay busy until it is done
+          await waitForJob(data.progress_url);
+          window.location.reload();
+          return;
+        }
+        const statuses: Record<string, string> = data.items ?? {};
+        updateItems(pks, (item) => ({ ...item, status: statuses[item.pk] ?? previous.get(item.pk) ?? item.status, busy: false }));
+      } catch (e) {
+        updateItems(pks, (item) => ({ ...item, status: previous.get(item.pk) ?? item.status, busy: false }));
+        setError(String(e));
+      }
+    },
+    [items, updateItems, config.csrf_token]
+  );
+
+  const issueItems = (pks: number[]) => runAction(pks, 'ON_LOAN', config.issue_url, { items: pks });
+
+  const returnItems = (pks: number[]) => {
+    if (!location) {
+      setError('Bitte zuerst einen Rückgabeort wählen.');
+      return;
+    }
+    setSelected((current) => new Set([...current].filter((pk) => !pks.includes(pk))));
+    runAction(pks, 'RETURNED', config.return_url, { items: pks, location: location.pk });
+  };
+
+  const pendingPks = useMemo(() => items.filter((item) => item.status === 'PENDING' && !item.busy).map((item) => item.pk), [items]);
+
+  // Virtual window: only rows inside the viewport (plus overscan) are in the DOM
+  const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+  const last = Math.min(items.length, Math.ceil((scrollTop + VIEWPORT_HEIGHT) / ROW_HEIGHT) + OVERSCAN);
+  const visible = items.slice(first, last);
+
+  return (
+    <Stack gap="xs">
+      {error && (
+        <Alert color="red" withCloseButton onClose={() => setError(null)}>
+          {error}
+        </Alert>
+      )}
+      <Group gap="sm">
+        {config.loan_open && (
+          <Button color="green" size="xs" disabled={!pendingPks.length} onClick={() => issueItems(pendingPks)}>
+            Alle ausstehenden Artikel ausgeben ({pendingPks.length})
+          </Button>
+        )}
+        <Autocomplete
+          size="xs"
+          w={300}
+          placeholder="Rückgabeort suchen..."
+          value={locationTerm}
+          onChange={setLocationTerm}
+          data={locations.map((loc) => loc.pathstring)}
+        />
+        <Button size="xs" disabled={!selected.size || !location} onClick={() => returnItems([...selected])}>
+          Ausgewählte zurückgeben ({selected.size})
+        </Button>
+        <Text size="sm" c="dimmed">
+          {items.length} / {config.items_total} Artikel geladen
+        </Text>
+        {loading && <Loader size="xs" />}
+      </Group>
+
+      <div
+        style={{ height: VIEWPORT_HEIGHT, overflowY: 'auto', position: 'relative' }}
+        onScroll={(event) => setScrollTop(event.currentTarget.scrollTop)}
+      >
+        <div style={{ height: items.length * ROW_HEIGHT, position: 'relative' }}>
+          {visible.map((item, index) => (
+            <Group
+              key={item.pk}
+              gap="sm"
+              wrap="nowrap"
+              style={{ position: 'absolute', top: (first + index) * ROW_HEIGHT, height: ROW_HEIGHT, left: 0, right: 0 }}
+            >
+              <Checkbox
+                size="xs"
+                disabled={item.status !== 'ON_LOAN' || item.busy}
+                checked={selected.has(item.pk)}
+                onChange={(event) => {
+                  const checked = event.currentTarget.checked;
+                  setSelected((current) => {
+                    const next = new Set(current);
+                    if (checked) {
+                      next.add(item.pk);
+                    } else {
+                      next.delete(item.pk);
+                    }
+                    return next;
+                  });
+                }}
+              />
+              <Text size="sm" w={300} truncate>
+                <a href={config.stock_item_url.replace('/0/', `/${item.stock_item}/`)}>{item.part_name}</a>
+              </Text>
+              <Text size="sm" w={150}>{item.serial ?? 'N/A'}</Text>
+              <Badge color={STATUS_COLORS[item.status] ?? 'gray'} variant={item.busy ? 'outline' : 'filled'}>
+                {item.status}
+              </Badge>
+              {item.status === 'PENDING' && config.loan_open && (
+                <Button size="compact-xs" color="green" disabled={item.busy} onClick={() => issueItems([item.pk])}>
+                  Ausgeben
+                </Button>
+              )}
+              {item.status === 'ON_LOAN' && (
+                <Button size="compact-xs" disabled={item.busy || !location} onClick={() => returnItems([item.pk])}>
+                  Zurückgeben
+                </Button>
+              )}
+            </Group>
+          ))}
+        </div>
+      </div>
+    </Stack>
+  );
+}
+
+// Entry point, called by loan_detail.html with the panel configuration
+export function renderLoanDetailPanel(target: HTMLElement | undefined, data: PluginRenderData<PanelConfig>) {
+  if (!target) {
+    console.error('No target provided to renderLoanDetailPanel');
+    return;
+  }
+
+  createRoot(target).render(
+    <MantineProvider theme={data?.theme} defaultColorScheme={data?.colorScheme}>
+      <LoanDetailPanel config={data?.context} />
+    </MantineProvider>
+  );
+}
@@ -0,0 +1,95 @@
+import { Alert, Anchor, Badge, MantineProvider, Stack, Table, Text } from '@mantine/core';
+import { createRoot } from 'react-dom/client';
+
+import type { PluginRenderData } from './types';
+
+// Loan history panel on the StockItem and Part pages.
+// All data comes from the panel context (see get_ui_panels in core.py) - no extra requests.
+
+type LoanRecord = {
+  loan: number;
+  reference: string;
+  customer: string | null;
+  serial: string | null;
+  start_date: string;
+  due_date: string;
+  return_date: string | null;
+  loan_status: string;
+  item_status: string;
+  url: string;
+  overdue: boolean;
+};
+
+type PanelContext = {
+  mode: 'stockitem' | 'part';
+  records: LoanRecord[];
+  active: LoanRecord | null;
+};
+
+const STATUS_COLORS: Record<string, string> = {
+  PENDING: 'blue',
+  ON_LOAN: 'orange',
+  RETURNED: 'green',
+};
+
+function LoanHistoryPanel({ context }: { context: PanelContext }) {
+  const { mode, records, active } = context;
+
+  return (
+    <Stack gap="xs">
+      {mode === 'stockitem' && active && (
+        <Alert color={active.overdue ? 'red' : 'orange'} title={active.overdue ? 'Überfällig' : 'Verliehen'}>
+          <Anchor href={active.url}>Leihvorgang #{active.loan}</Anchor>
+          {active.customer && ` an ${active.customer}`} – fällig am {active.due_date}
+        </Alert>
+      )}
+      <Table striped>
+        <Table.Thead>
+          <Table.Tr>
+            <Table.Th>Leihvorgang</Table.Th>
+            {mode === 'part' && <Table.Th>Seriennummer</Table.Th>}
+            <Table.Th>Kunde</Table.Th>
+            <Table.Th>Von</Table.Th>
+            <Table.Th>Fällig</Table.Th>
+            <Table.Th>Zurück</Table.Th>
+            <Table.Th>Status</Table.Th>
+          </Table.Tr>
+        </Table.Thead>
+        <Table.Tbody>
+          {records.map((record) => (
+            <Table.Tr key={`${record.loan}-${record.serial ?? ''}`}>
+              <Table.Td>
+                <Anchor href={record.url}>#{record.loan}</Anchor>
+                {record.reference && <Text span c="dimmed"> {record.reference}</Text>}
+              </Table.Td>
+              {mode === 'part' && <Table.Td>{record.serial}</Table.Td>}
+              <Table.Td>{record.customer ?? '-'}</Table.Td>
+              <Table.Td>{record.start_date}</Table.Td>
+              <Table.Td>{record.due_date}</Table.Td>
+              <Table.Td>{record.return_date ?? '-'}</Table.Td>
+              <Table.Td>
+                <Badge color={record.overdue ? 'red' : STATUS_COLORS[record.item_status] ?? 'gray'}>
+                  {record.overdue ? 'OVERDUE' : record.item_status}
+                </Badge>
+              </Table.Td>
+            </Table.Tr>
+          ))}
+        </Table.Tbody>
+      </Table>
+    </Stack>
+  );
+}
+
+// Entry point called by InvenTree to render the panel
+export function renderLoanHistoryPanel(target: HTMLElement | undefined, data: PluginRenderData<PanelContext>) {
+  if (!target) {
+    console.error('No target provided to renderLoanHistoryPanel');
+    return;
+  }
+
+  createRoot(target).render(
+    <MantineProvider theme={data?.theme} defaultColorScheme={data?.colorScheme}>
+      <LoanHistoryPanel context={data?.context} />
+    </MantineProvider>
+  );
+}
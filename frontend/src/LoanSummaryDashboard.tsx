@@ -0,0 +1,83 @@
+import { Anchor, Group, MantineProvider, Stack, Table, Text } from '@mantine/core';
+import { createRoot } from 'react-dom/client';
+
+import type { PluginRenderData } from './types';
+
+// Dashboard item: open and overdue loans per customer.
+// All data comes from the item context (see get_ui_dashboard_items in core.py).
+
+type Totals = {
+  pending_loans: number;
+  active_loans: number;
+  overdue_loans: number;
+  items_pending: number;
+  items_on_loan: number;
+};
+
+type CustomerRow = {
+  customer: number;
+  name: string;
+  pending_loans: number;
+  active_loans: number;
+  overdue_loans: number;
+  items_on_loan: number;
+};
+
+type DashboardContext = {
+  totals: Totals;
+  customers: CustomerRow[];
+  list_url: string;
+};
+
+function LoanSummaryDashboard({ context }: { context: DashboardContext }) {
+  const { totals, customers, list_url } = context;
+
+  return (
+    <Stack gap="xs">
+      <Group gap="lg">
+        <Text>Aktiv: <b>{totals.active_loans}</b></Text>
+        <Text c={totals.overdue_loans ? 'red' : undefined}>Überfällig: <b>{totals.overdue_loans}</b></Text>
+        <Text>Offen: <b>{totals.pending_loans}</b></Text>
+        <Text>Verliehene Artikel: <b>{totals.items_on_loan}</b></Text>
+      </Group>
+      <Table striped>
+        <Table.Thead>
+          <Table.Tr>
+            <Table.Th>Kunde</Table.Th>
+            <Table.Th>Aktiv</Table.Th>
+            <Table.Th>Überfällig</Table.Th>
+            <Table.Th>Offen</Table.Th>
+            <Table.Th>Artikel</Table.Th>
+          </Table.Tr>
+        </Table.Thead>
+        <Table.Tbody>
+          {customers.map((row) => (
+            <Table.Tr key={row.customer}>
+              <Table.Td>
+                <Anchor href={`${list_url}?customer=${row.customer}`}>{row.name}</Anchor>
+              </Table.Td>
+              <Table.Td>{row.active_loans}</Table.Td>
+              <Table.Td c={row.overdue_loans ? 'red' : undefined}>{row.overdue_loans}</Table.Td>
+              <Table.Td>{row.pending_loans}</Table.Td>
+              <Table.Td>{row.items_on_loan}</Table.Td>
+            </Table.Tr>
+          ))}
+        </Table.Tbody>
+      </Table>
+    </Stack>
+  );
+}
+
+// Entry point called by InvenTree to render the dashboard item
+export function renderLoanSummaryDashboard(target: HTMLElement | undefined, data: PluginRenderData<DashboardContext>) {
+  if (!target) {
+    console.error('No target provided to renderLoanSummaryDashboard');
+    return;
+  }
+
+  createRoot(target).render(
+    <MantineProvider theme={data?.theme} defaultColorScheme={data?.colorScheme}>
+      <LoanSummaryDashboard context={data?.context} />
+    </MantineProvider>
+  );
+}
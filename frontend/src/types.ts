@@ -0,0 +1,9 @@
+import type { MantineColorScheme, MantineThemeOverride } from '@mantine/core';
+
+// Data InvenTree passes to a plugin's render function (panels and dashboard items).
+// 'context' is the context dict returned by get_ui_panels / get_ui_dashboard_items in core.py.
+export type PluginRenderData<Context> = {
+  context: Context;
+  theme?: MantineThemeOverride;
+  colorScheme?: MantineColorScheme;
+};
@@ -15,8 +15,9 @@ export default defineConfig({
     rollupOptions: {
       preserveEntrySignatures: "exports-only",
       input: [
-        
-        
+        './src/LoanHistoryPanel.tsx',
+        './src/LoanSummaryDashboard.tsx',
+        './src/LoanDetailPanel.tsx',
       ],
       output: {
         dir: '../meinplugin/static',
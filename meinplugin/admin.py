@@ -8,18 +8,30 @@ class LoanedItemInline(admin.TabularInline):
     extra = 1 # Show one empty slot for adding items
     # Define fields to show/edit in the inline form
     fields = ('stock_item', 'status')
+    # A plain select would render every serialized StockItem in the database
+    raw_id_fields = ('stock_item',)
     # Make stock_item read-only after creation? Maybe.
     # readonly_fields = ('stock_item',)
 
+    def get_queryset(self, request):
+        # StockItem.__str__ needs the part
+        return super().get_queryset(request).select_related('stock_item__part')
+
 
 @admin.register(Loan)
 class LoanAdmin(admin.ModelAdmin):
     """Admin interface for the Loan model."""
     list_display = ('id', 'customer', 'loan_date', 'due_date', 'status', 'return_date')
-    list_filter = ('status', 'customer', 'due_date')
-    search_fields = ('id', 'customer__name', 'reference')
+    list_select_related = ('customer',) # Avoid one query per row for the customer name
+    # No 'customer' filter - it would list every company; search by customer name instead
+    list_filter = ('status', 'due_date')
+    # Exact id and prefix matches only, so the search can use indexes (no leading wildcard)
+    search_fields = ('=id', '^customer__name', '^reference')
+    autocomplete_fields = ('customer',)
     readonly_fields = ('loan_date', 'updated_at', 'created_by') # Fields not editable in admin
     inlines = [LoanedItemInline] # Embed LoanedItem editing
+    # Skip the extra COUNT(*) over the whole table on every changelist page
+    show_full_result_count = False
 
     # Optional: Automatically set created_by user
     def save_model(self, request, obj, form, change):
@@ -32,7 +44,10 @@ class LoanAdmin(admin.ModelAdmin):
 class LoanedItemAdmin(admin.ModelAdmin):
     """Admin interface for the LoanedItem model (optional, mainly for debugging)."""
     list_display = ('id', 'loan', 'stock_item', 'status')
-    list_filter = ('status', 'loan__customer')
-    search_fields = ('stock_item__serial', 'loan__id', 'loan__customer__name')
+    list_select_related = ('loan__customer', 'stock_item__part')
+    list_filter = ('status',)
+    search_fields = ('=stock_item__serial', '=loan__id', '^loan__customer__name')
+    raw_id_fields = ('loan', 'stock_item')
+    show_full_result_count = False
     # Make fields read-only maybe?
-    # readonly_fields = ('loan', 'stock_item')
\ No newline at end of file
+    # readonly_fields = ('loan', 'stock_item')
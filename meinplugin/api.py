@@ -0,0 +1,337 @@
+# meinplugin/api.py
+"""
+JSON API for loans and loaned items (DRF).
+
+List endpoints use keyset pagination (?cursor=...), detail and list responses carry
+ETag / Last-Modified headers based on Loan.updated_at (of the page's loans for lists),
+so polling clients get 304s.
+Status transitions go through the plugin's issue / return methods; their POSTs accept an
+'Idempotency-Key' header (see idempotency.py).
+"""
+import hashlib
+
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from plugin import registry
+from stock.models import StockLocation
+
+from .idempotency import idempotent_response
+from .instrumentation import instrument
+from .models import CustomerLoanSummary, Loan, LoanedItem, LoanJob
+from .pagination import KeysetPaginator
+from .serializers import (CustomerLoanSummarySerializer, LoanAddItemsSerializer, LoanedItemSerializer,
+                          LoanIssueSerializer, LoanReturnSerializer, LoanSerializer)
+from .views import filter_loans
+
+# Default and maximum page size of the list endpoints
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+
+def get_page_size(request):
+    try:
+        return max(1, min(int(request.query_params.get('limit', API_PAGE_SIZE)), API_MAX_PAGE_SIZE))
+    except ValueError:
+        return API_PAGE_SIZE
+
+
+def get_plugin():
+    plugin = registry.get_plugin('loan')
+    if not plugin:
+        raise RuntimeError("Loan plugin (slug='loan') not found or not active.")
+    return plugin
+
+
+def conditional(request, updated_at, tag):
+    """
+    Returns (304 response or None, headers) for a resource last changed at 'updated_at'.
+
+    'tag' must identify the representation (resource and query string), the ETag is built
+    from it and the modification time.
+    """
+    if updated_at is None:
+        return None, {}
+
+    etag = f'"{tag}-{int(updated_at.timestamp() * 1000000)}"'
+    last_modified = int(updated_at.timestamp())
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified)}
+    return get_conditional_response(request, etag=etag, last_modified=last_modified), headers
+
+
+class InstrumentedApiMixin:
+    """Records the endpoint with the opt-in instrumentation (see instrumentation.py)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with instrument(f'api:{self.__class__.__name__}'):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class LoanApiMixin(InstrumentedApiMixin):
+    """Shared query string handling of the loan endpoints."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.request.query_params.get('fields')
+        context['fields'] = [name.strip() for name in fields.split(',')] if fields else None
+        context['include_items'] = 'items' in self.request.query_params.get('include', '').split(',')
+        return context
+
+    def get_queryset(self):
+        queryset = Loan.objects.select_related('customer')
+        if self.get_serializer_context()['include_items']:
+            # One extra query for all items of the page, not one per loan
+            queryset = queryset.prefetch_related(Prefetch(
+                'items', queryset=LoanedItem.objects.select_related('stock_item__part').order_by('pk')
+            ))
+        return queryset
+
+
+class LoanList(LoanApiMixin, generics.ListCreateAPIView):
+    """
+    GET: loans, newest first (?cursor=, ?limit=, ?fields=, ?include=items, filters as on
+    the list page). POST: create a loan.
+    """
+
+    serializer_class = LoanSerializer
+
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = filter_loans(self.get_queryset(), request.query_params)
+        except (ValueError, TypeError):
+            return Response({'error': "Invalid filter"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = KeysetPaginator(queryset, get_page_size(request)).page(request.query_params.get('cursor'))
+        except ValueError:
+            return Response({'error': "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 304 for polling clients, from the rows of this page and its cursors - no
+        # aggregate over all filtered loans, only the serialization is saved
+        rows = [(loan.pk, loan.updated_at) for loan in page.object_list]
+        changed = max((updated_at for _pk, updated_at in rows if updated_at), default=None)
+        digest = hashlib.sha1(
+            repr((rows, page.next_cursor, page.previous_cursor, request.GET.urlencode())).encode()
+        ).hexdigest()
+        not_modified, headers = conditional(request, changed, f"loans-{digest}")
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(page.object_list, many=True)
+        return Response({
+            'results': serializer.data,
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        }, headers=headers)
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user, status=Loan.LoanStatus.PENDING)
+
+
+class LoanDetail(LoanApiMixin, generics.RetrieveUpdateAPIView):
+    """GET / PATCH a single loan (?fields=, ?include=items)."""
+
+    serializer_class = LoanSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        # Check the modification time first, the full loan is only loaded if it changed
+        updated_at = get_object_or_404(Loan.objects.values_list('updated_at', flat=True), pk=kwargs['pk'])
+        not_modified, headers = conditional(request, updated_at, f"loan-{kwargs['pk']}-{request.GET.urlencode()}")
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data, headers=headers)
+
+
+class LoanItemList(InstrumentedApiMixin, generics.ListAPIView):
+    """Items of a loan in pk order, paginated with ?after=<last pk>&limit=."""
+
+    serializer_class = LoanedItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        items = LoanedItem.objects.filter(loan_id=kwargs['pk']).select_related('stock_item__part').order_by('pk')
+
+        if request.query_params.get('status'):
+            items = items.filter(status=request.query_params['status'])
+        try:
+            after = int(request.query_params.get('after', 0))
+        except ValueError:
+            return Response({'error': "Invalid 'after'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = get_page_size(request)
+        rows = list(items.filter(pk__gt=after)[:limit + 1])
+        more = len(rows) > limit
+        rows = rows[:limit]
+
+        return Response({
+            'results': self.get_serializer(rows, many=True).data,
+            'next': rows[-1].pk if more else None,
+        })
+
+
+class LoanedItemDetail(InstrumentedApiMixin, generics.RetrieveAPIView):
+    """GET a single loaned item."""
+
+    serializer_class = LoanedItemSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = LoanedItem.objects.select_related('stock_item__part')
+
+
+class LoanAddItems(InstrumentedApiMixin, APIView):
+    """POST {"items": ["<serial or pk>", ...]} -> {"added": [...], "errors": {...}}"""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        # Retries with the same Idempotency-Key get the first response again
+        return idempotent_response(request, lambda: self.perform(request, pk))
+
+    def perform(self, request, pk):
+        data, error = validated_payload(LoanAddItemsSerializer, request)
+        if error:
+            return error
+
+        loan = get_object_or_404(Loan, pk=pk)
+        try:
+            added, errors = get_plugin().add_items_to_loan(loan, data['items'])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'added': [{'pk': item.pk, 'stock_item': item.stock_item_id} for item in added],
+            'errors': errors,
+        })
+
+
+def validated_payload(serializer_class, request):
+    """(data, None) for a valid request body, else (None, 400 response)."""
+    serializer = serializer_class(data=request.data)
+    if not serializer.is_valid():
+        return None, Response({'error': "Invalid request", 'details': serializer.errors},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return serializer.validated_data, None
+
+
+def item_statuses(loan, item_pks):
+    """Current status of the given items of 'loan' ({pk: status}), for optimistic clients."""
+    return dict(loan.items.filter(pk__in=item_pks).values_list('pk', 'status'))
+
+
+def background_job_response(loan, job):
+    """202 response for an action handed to the background worker."""
+    return Response({
+        'job': job.pk,
+        'progress_url': reverse('plugin:loan:loan_job_progress', kwargs={'pk': loan.pk, 'job_pk': job.pk}),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+class LoanIssue(InstrumentedApiMixin, APIView):
+    """
+    POST {"items": [<LoanedItem pk>, ...]} (omit 'items' to issue all pending items).
+
+    -> {"issued": <count>, "items": {<pk>: <status>}}, or 202 with the background job
+    if more items than BACKGROUND_THRESHOLD are issued.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        # Retries with the same Idempotency-Key get the first response again
+        return idempotent_response(request, lambda: self.perform(request, pk))
+
+    def perform(self, request, pk):
+        data, error = validated_payload(LoanIssueSerializer, request)
+        if error:
+            return error
+
+        loan = get_object_or_404(Loan, pk=pk)
+        items = loan.items.filter(status=LoanedItem.ItemStatus.PENDING)
+        if 'items' in data:
+            items = items.filter(pk__in=data['items'])
+        items = list(items)
+
+        plugin = get_plugin()
+        if plugin.runs_in_background(len(items)):
+            return background_job_response(loan, plugin.start_loan_job(loan, LoanJob.Action.ISSUE, items, request.user))
+
+        try:
+            issued = plugin.issue_loan_items(items, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'issued': issued, 'items': item_statuses(loan, data.get('items', [item.pk for item in items]))})
+
+
+class LoanReturn(InstrumentedApiMixin, APIView):
+    """
+    POST {"items": [<LoanedItem pk>, ...], "location": <StockLocation pk>}
+
+    -> {"returned": <count>, "items": {<pk>: <status>}}, or 202 with the background job
+    if more items than BACKGROUND_THRESHOLD are returned.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        # Retries with the same Idempotency-Key get the first response again
+        return idempotent_response(request, lambda: self.perform(request, pk))
+
+    def perform(self, request, pk):
+        data, error = validated_payload(LoanReturnSerializer, request)
+        if error:
+            return error
+
+        loan = get_object_or_404(Loan, pk=pk)
+        location = StockLocation.objects.filter(pk=data['location']).first()
+        if location is None:
+            return Response({'error': "Return location not found"}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = list(loan.items.filter(status=LoanedItem.ItemStatus.ON_LOAN, pk__in=data['items']))
+
+        plugin = get_plugin()
+        if plugin.runs_in_background(len(items)):
+            return background_job_response(
+                loan, plugin.start_loan_job(loan, LoanJob.Action.RETURN, items, request.user, return_location=location)
+            )
+
+        try:
+            returned = plugin.return_loan_items(items, location, request.user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'returned': returned, 'items': item_statuses(loan, data['items'])})
+
+
+class CustomerSummaryList(InstrumentedApiMixin, generics.ListAPIView):
+    """
+    Open loans and items per customer, from the CustomerLoanSummary table.
+
+    Reads O(customers) rows, independent of the loan history. ?customer=<pk> returns a
+    single customer (also without open loans), ?all=1 includes customers without open loans.
+    """
+
+    serializer_class = CustomerLoanSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        summaries = CustomerLoanSummary.with_open_loans()
+
+        if request.query_params.get('customer') or request.query_params.get('all'):
+            summaries = CustomerLoanSummary.objects.select_related('customer')
+        if request.query_params.get('customer'):
+            summaries = summaries.filter(customer_id=request.query_params['customer'])
+
+        return Response({
+            'totals': CustomerLoanSummary.totals(),
+            'results': self.get_serializer(summaries, many=True).data,
+        })
@@ -0,0 +1,301 @@
+# meinplugin/benchmark.py
+"""
+Synthetic loan data and performance measurements for the loan plugin.
+
+Used by the 'loan_benchmark' management command. Everything runs inside a transaction
+which is rolled back at the end, so it can be pointed at a local test database
+(SQLite / PostgreSQL) without leaving data behind. The concurrency test of the
+'loan_load_test' command commits its data and deletes it again afterwards.
+"""
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from company.models import Company
+from part.models import Part
+from stock.models import StockItem, StockLocation
+
+from .models import Loan, LoanedItem
+
+BENCH_PREFIX = 'BENCH'
+
+
+def generate_loan_data(customers, loans, items, spare_items=None, prefix=BENCH_PREFIX):
+    """
+    Creates 'customers' customers, 'loans' loans and 'items' serialized loaned items.
+
+    Loans are split into three equal groups - PENDING (items pending), ACTIVE (items on
+    loan) and RETURNED (items returned) - with the items spread evenly over them.
+    'spare_items' additional serialized StockItems (default: 10% of 'items') are not on
+    any loan. Uses bulk_create throughout. Returns a dict of the created objects.
+    """
+    if spare_items is None:
+        spare_items = max(1, items // 10)
+
+    store = StockLocation.objects.create(name=f'{prefix} Store', description='Benchmark data')
+    loan_location = StockLocation.objects.create(name=f'{prefix} On Loan', description='Benchmark data')
+    part = Part.objects.create(
+        name=f'{prefix} Instrument', description='Benchmark data', trackable=True, component=True,
+    )
+
+    companies = Company.objects.bulk_create([
+        Company(name=f'{prefix} Customer {i}', description='Benchmark data', is_customer=True)
+        for i in range(customers)
+    ])
+
+    # StockItem is an MPTT model - bulk_create needs the tree fields, every item is its own root
+    next_tree = (StockItem.objects.aggregate(tree=Max('tree_id'))['tree'] or 0) + 1
+    stock_items = StockItem.objects.bulk_create([
+        StockItem(
+            part=part, quantity=1, serial=f'{prefix}-{i:07d}', serial_int=i, location=store,
+            tree_id=next_tree + i, lft=1, rght=2, level=0,
+        )
+        for i in range(items + spare_items)
+    ])
+    loaned_stock, spare_stock = stock_items[:items], stock_items[items:]
+
+    groups = [
+        (Loan.LoanStatus.PENDING, LoanedItem.ItemStatus.PENDING, 'items_pending'),
+        (Loan.LoanStatus.ACTIVE, LoanedItem.ItemStatus.ON_LOAN, 'items_on_loan'),
+        (Loan.LoanStatus.RETURNED, LoanedItem.ItemStatus.RETURNED, 'items_returned'),
+    ]
+
+    # Spread the items evenly over the loans, then fill in the counters up front
+    assignment = [[] for _ in range(loans)]
+    for i, stock_item in enumerate(loaned_stock):
+        assignment[i % loans].append(stock_item)
+
+    today = date.today()
+    new_loans = []
+    for i in range(loans):
+        loan_status, _item_status, counter = groups[i % len(groups)]
+        loan = Loan(
+            customer=companies[i % customers],
+            due_date=today + timedelta(days=(i % 60) - 20),
+            status=loan_status,
+            reference=f'{prefix}-{i}',
+        )
+        setattr(loan, counter, len(assignment[i]))
+        new_loans.append(loan)
+    new_loans = Loan.objects.bulk_create(new_loans)
+
+    new_items = []
+    for i, loan in enumerate(new_loans):
+        _loan_status, item_status, _counter = groups[i % len(groups)]
+        new_items.extend(
+            LoanedItem(loan=loan, stock_item=stock_item, status=item_status)
+            for stock_item in assignment[i]
+        )
+    LoanedItem.objects.bulk_create(new_items, batch_size=1000)
+
+    return {
+        'store': store,
+        'loan_location': loan_location,
+        'part': part,
+        'customers': companies,
+        'loans': new_loans,
+        'spare_stock': spare_stock,
+    }
+
+
+def measure(name, func, repeat):
+    """
+    Runs 'func(i)' 'repeat' times and returns latency and query count statistics.
+
+    Each run gets its index, so it can work on a different object.
+    """
+    timings = []
+    queries = []
+    for i in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            func(i)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(context.captured_queries))
+
+    return {
+        'name': name,
+        'runs': repeat,
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+    }
+
+
+def run_benchmark(plugin, items, loans, customers, repeat=5):
+    """
+    Generates a data set of the given size and measures the plugin's hot paths on it.
+
+    Returns a list of measurement dicts (see measure()). All data is rolled back.
+    """
+    from .core import invalidate_loan_location_cache
+    from .views import LoanDetailView, LoanListView
+
+    factory = RequestFactory()
+    results = []
+
+    with transaction.atomic():
+        data = generate_loan_data(customers, loans, items)
+        plugin.set_setting('LOAN_LOCATION', data['loan_location'].pk)
+
+        user = get_user_model().objects.create_user(username=f'{BENCH_PREFIX.lower()}-user', is_staff=True)
+
+        def render(view, path, **kwargs):
+            request = factory.get(path)
+            request.user = user
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+        list_view = LoanListView.as_view()
+        detail_view = LoanDetailView.as_view()
+        largest_loan = max(data['loans'], key=lambda loan: loan.items_total)
+
+        pending = list(LoanedItem.objects.filter(status=LoanedItem.ItemStatus.PENDING).order_by('pk')[:repeat])
+        on_loan = list(LoanedItem.objects.filter(status=LoanedItem.ItemStatus.ON_LOAN).order_by('pk')[:repeat])
+        open_loans = [loan for loan in data['loans'] if loan.is_open]
+        spare = data['spare_stock']
+
+        results.append(measure('LoanListView', lambda i: render(list_view, '/'), repeat))
+        results.append(measure('LoanListView (cursor)', lambda i: render(list_view, '/?cursor='), repeat))
+        results.append(measure(
+            'LoanDetailView', lambda i: render(detail_view, '/', pk=largest_loan.pk), repeat,
+        ))
+        if len(pending) == repeat:
+            results.append(measure('issue_loan_item', lambda i: plugin.issue_loan_item(pending[i], user), repeat))
+        if len(on_loan) == repeat:
+            results.append(measure(
+                'return_loan_item', lambda i: plugin.return_loan_item(on_loan[i], data['store'], user), repeat,
+            ))
+        if open_loans and len(spare) >= repeat:
+            results.append(measure(
+                'add_item',
+                lambda i: plugin.add_items_to_loan(open_loans[i % len(open_loans)], [spare[i].serial]),
+                repeat,
+            ))
+
+        transaction.set_rollback(True)
+
+    # The rolled back setting may still be cached
+    invalidate_loan_location_cache()
+
+    for result in results:
+        result.update({'items': items, 'loans': loans, 'customers': customers})
+    return results
+
+
+def run_concurrency_test(plugin, scanners=8, items=1000, batch_size=10, prefix=f'{BENCH_PREFIX}-LOAD', keep=False):
+    """
+    Issues and then returns all items of one loan from 'scanners' parallel threads.
+
+    Every scanner goes through all items in its own random order, so the batches overlap
+    all the time - the worst case for double transfers and deadlocks. Unlike run_benchmark()
+    the data must be committed (each thread has its own connection); it is deleted at the
+    end unless 'keep' is set. Needs a database with row locks (PostgreSQL / MySQL).
+    Returns throughput numbers and the consistency checks (True = passed).
+    """
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import OperationalError, connections
+    from django.db.models import Count
+
+    from stock.models import StockItemTracking
+
+    from .core import invalidate_loan_location_cache
+
+    data = generate_loan_data(customers=1, loans=1, items=items, spare_items=0, prefix=prefix)
+    loan = data['loans'][0]
+    user = get_user_model().objects.create_user(username=f'{prefix.lower()}-user')
+    item_pks = list(loan.items.order_by('pk').values_list('pk', flat=True))
+    stock_pks = list(loan.items.values_list('stock_item_id', flat=True))
+
+    previous_location = plugin.get_setting('LOAN_LOCATION')
+    plugin.set_setting('LOAN_LOCATION', data['loan_location'].pk)
+    invalidate_loan_location_cache()
+
+    def scanner(seed, action):
+        """One operator: processes all items in random batches, returns (done, deadlocks)."""
+        rng = random.Random(seed)
+        order = item_pks[:]
+        rng.shuffle(order)
+        done = deadlocks = 0
+        try:
+            for start in range(0, len(order), batch_size):
+                # Only the pks are used by the batch methods
+                batch = [LoanedItem(pk=pk) for pk in order[start:start + batch_size]]
+                for _attempt in range(3):
+                    try:
+                        if action == 'issue':
+                            done += plugin.issue_loan_items(batch, user)
+                        else:
+                            done += plugin.return_loan_items(batch, data['store'], user)
+                        break
+                    except OperationalError:
+                        deadlocks += 1
+            return done, deadlocks
+        finally:
+            connections.close_all()
+
+    def phase(action):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=scanners) as pool:
+            results = list(pool.map(lambda seed: scanner(seed, action), range(scanners)))
+        seconds = time.perf_counter() - start
+        return {
+            'processed': sum(done for done, _deadlocks in results),
+            'deadlocks': sum(deadlocks for _done, deadlocks in results),
+            'seconds': round(seconds, 3),
+            'items_per_second': round(items / seconds, 1) if seconds else None,
+        }
+
+    try:
+        issue = phase('issue')
+        returned = phase('return')
+
+        loan.refresh_from_db()
+        # Tracking entries per StockItem (the generated items start without any)
+        tracking = list(
+            StockItemTracking.objects.filter(item_id__in=stock_pks).values('item_id')
+            .annotate(n=Count('pk')).values_list('n', flat=True)
+        )
+        checks = {
+            # Every item was issued and returned exactly once, however often it was scanned
+            'issued_once': issue['processed'] == items,
+            'returned_once': returned['processed'] == items,
+            # One stock move per issue and per return - no double transfers
+            'two_moves_per_item': len(tracking) == items and set(tracking) == {2},
+            'counters': (loan.items_pending, loan.items_on_loan, loan.items_returned) == (0, 0, items),
+            'loan_returned': loan.status == Loan.LoanStatus.RETURNED,
+        }
+    finally:
+        plugin.set_setting('LOAN_LOCATION', previous_location)
+        invalidate_loan_location_cache()
+        if not keep:
+            StockItemTracking.objects.filter(item_id__in=stock_pks).delete()
+            Loan.objects.filter(pk=loan.pk).delete()
+            StockItem.objects.filter(pk__in=stock_pks).delete()
+            # InvenTree only deletes inactive parts
+            data['part'].active = False
+            data['part'].delete()
+            StockLocation.objects.filter(pk__in=[data['store'].pk, data['loan_location'].pk]).delete()
+            Company.objects.filter(pk__in=[company.pk for company in data['customers']]).delete()
+            user.delete()
+
+    return {
+        'database': connection.vendor,
+        'scanners': scanners,
+        'items': items,
+        'batch_size': batch_size,
+        'issue': issue,
+        'return': returned,
+        'checks': checks,
+    }
@@ -0,0 +1,88 @@
+# meinplugin/caching.py
+"""
+Cache versions for rendered loan fragments.
+
+Every Loan has a version number in Django's cache which is changed whenever the loan or
+one of its items is saved or deleted (see signals.py). Fragment cache keys contain the
+version and Loan.updated_at, so a changed loan never hits an old fragment.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# How long rendered fragments are kept
+FRAGMENT_CACHE_SECONDS = 60 * 60
+
+
+def _version_key(loan_pk):
+    return f'meinplugin:loan:{loan_pk}:version'
+
+
+def get_loan_cache_versions(loan_pks):
+    """Maps each Loan pk to its current cache version (one cache round trip)."""
+    keys = {_version_key(pk): pk for pk in loan_pks}
+    found = cache.get_many(keys.keys())
+
+    versions = {}
+    missing = {}
+    for key, pk in keys.items():
+        if key in found:
+            versions[pk] = found[key]
+        else:
+            # Unique start value, so an evicted version can't collide with an old one
+            versions[pk] = missing[key] = time.time_ns()
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return versions
+
+
+def get_loan_cache_version(loan_pk):
+    return get_loan_cache_versions([loan_pk])[loan_pk]
+
+
+def bump_loan_cache_version(*loan_pks):
+    """Invalidates all cached fragments of the given loans (after the running transaction)."""
+    loan_pks = [pk for pk in loan_pks if pk]
+    if loan_pks:
+        # Bumped before the commit, a concurrent request could cache the old state under the new version
+        transaction.on_commit(
+            lambda: cache.set_many({_version_key(pk): time.time_ns() for pk in loan_pks}, timeout=None)
+        )
+
+
+def loan_fragment_key(loan, version):
+    """Cache key part for a loan's fragments: pk, last change and cache version."""
+    updated = loan.updated_at.timestamp() if loan.updated_at else 0
+    return f'{loan.pk}-{updated}-{version}'
+
+
+def _stock_history_key(stock_item_pk):
+    return f'meinplugin:stockitem:{stock_item_pk}:loans'
+
+
+def get_stock_loan_history(stock_item_pk, build):
+    """
+    Cached loan history of a StockItem, 'build()' returns the rows (dicts with a 'loan' pk).
+
+    The entry stays valid while the cache versions of all its loans are unchanged, so
+    status changes need no extra invalidation. Records added to (or removed from) the
+    StockItem drop the entry with invalidate_stock_loan_history().
+    """
+    key = _stock_history_key(stock_item_pk)
+    cached = cache.get(key)
+    if cached is not None and get_loan_cache_versions(cached['versions'].keys()) == cached['versions']:
+        return cached['rows']
+
+    rows = build()
+    versions = get_loan_cache_versions({row['loan'] for row in rows})
+    cache.set(key, {'versions': versions, 'rows': rows}, FRAGMENT_CACHE_SECONDS)
+    return rows
+
+
+def invalidate_stock_loan_history(*stock_item_pks):
+    """Drops the cached loan history of the given StockItems (after the running transaction)."""
+    keys = [_stock_history_key(pk) for pk in stock_item_pks if pk]
+    if keys:
+        # Before the commit another request could cache the old history again
+        transaction.on_commit(lambda: cache.delete_many(keys))
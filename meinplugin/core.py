@@ -1,21 +1,72 @@
 # meinplugin/core.py
+import json
+import logging
+import time
+from datetime import date
+from typing import TYPE_CHECKING
 
 # Standard Django imports
-from django.http import HttpResponse
-from django.urls import path, include # include needed for separate urls.py
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BooleanField, Case, Exists, OuterRef, Q, Value, When
+from django.urls import path, include, reverse # include needed for separate urls.py
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 # InvenTree plugin imports
 from plugin import InvenTreePlugin
-from plugin.mixins import (NavigationMixin, ScheduleMixin, SettingsMixin,
-                           UrlsMixin, UserInterfaceMixin)
+from plugin.mixins import (BarcodeMixin, NavigationMixin, ScheduleMixin,
+                           SettingsMixin, UrlsMixin, UserInterfaceMixin)
 
 # Import plugin's models and version
 from . import PLUGIN_VERSION
-from stock.models import StockLocation # Needed for Setting model choice
+from .models import CustomerLoanSummary, Loan, LoanedItem, LoanJob
+from stock.models import StockItem, StockItemTracking, StockLocation # Needed for Setting model choice
+from stock.status_codes import StockHistoryCode
+from .caching import get_stock_loan_history, invalidate_stock_loan_history
+from .instrumentation import instrumented
+# Register signal receivers (cache invalidation etc.)
+from . import signals  # noqa: F401
+
+if TYPE_CHECKING:
+    from InvenTree.models import InvenTreeUser
+
+logger = logging.getLogger('inventree')
+
+
+# Per-process cache for the resolved location settings (see meinplugin._get_location_setting).
+# Entries are dropped by the signal receivers in signals.py when a setting or the
+# location changes; the TTL bounds staleness for changes made in other processes.
+LOAN_LOCATION_CACHE_TTL = 300 # seconds
+
+# Settings which point to a StockLocation and are resolved through the cache
+LOCATION_SETTINGS = ('LOAN_LOCATION', 'DEFAULT_RETURN_LOCATION')
+
+_loan_location_cache = {} # setting key -> cache entry
+
+# Max. number of loan records shown in the StockItem / Part panels
+LOAN_HISTORY_LIMIT = 50
+
+# Max. number of customers listed on the dashboard item
+DASHBOARD_CUSTOMER_LIMIT = 10
+
+
+def invalidate_loan_location_cache(location_pk=None, setting=None):
+    """
+    Drops cached location settings.
+
+    If 'setting' is given, only that setting is dropped. If 'location_pk' is given, an
+    entry is only dropped if it refers to that location (or holds an error, which the
+    change might have fixed).
+    """
+    for key, entry in list(_loan_location_cache.items()):
+        if setting is not None and key != setting:
+            continue
+        if location_pk is None or entry['error'] or entry['location_pk'] == location_pk:
+            _loan_location_cache.pop(key, None)
+
 
 # Die Hauptklasse für dein Plugin
-class meinplugin(ScheduleMixin, SettingsMixin, UserInterfaceMixin, NavigationMixin, UrlsMixin, InvenTreePlugin):
+class meinplugin(BarcodeMixin, ScheduleMixin, SettingsMixin, UserInterfaceMixin, NavigationMixin, UrlsMixin, InvenTreePlugin):
     """meinplugin - Loan functionality plugin."""
 
     # Plugin metadata
@@ -45,6 +96,16 @@ class meinplugin(ScheduleMixin, SettingsMixin, UserInterfaceMixin, NavigationMix
             'link': 'plugin:loan:loan_create', # Link to create view
             'icon': 'fas fa-plus-circle',
         },
+        {
+            'name': _('Archiv'),
+            'link': 'plugin:loan:loan_archive', # Archived (closed) loans
+            'icon': 'fas fa-archive',
+        },
+        {
+            'name': _('Rückgabe scannen'),
+            'link': 'plugin:loan:return_desk', # Continuous barcode returns
+            'icon': 'fas fa-barcode',
+        },
     ]
 
     # URL-Definitionen (von UrlsMixin)
@@ -68,6 +129,35 @@ class meinplugin(ScheduleMixin, SettingsMixin, UserInterfaceMixin, NavigationMix
             'model': 'stock.stocklocation', # Link to StockLocation model
             'required': True, # Make this setting mandatory
         },
+        'DEFAULT_RETURN_LOCATION': {
+            'name': _('Standard-Rückgabeort'),
+            'description': _('Lagerort, an den per Barcode zurückgegebene Artikel verschoben werden'),
+            'model': 'stock.stocklocation',
+        },
+        'BACKGROUND_THRESHOLD': {
+            'name': _('Schwelle für Hintergrundverarbeitung'),
+            'description': _('Ausgabe / Rückgabe von mehr Artikeln als diesem Wert läuft im Hintergrund'),
+            'validator': int,
+            'default': 50,
+        },
+        'ENABLE_INSTRUMENTATION': {
+            'name': _('Performance-Messung'),
+            'description': _('Abfragen und Laufzeiten der Plugin-Ansichten und Lagerbewegungen aufzeichnen'),
+            'validator': bool,
+            'default': False,
+        },
+        'ARCHIVE_AFTER_DAYS': {
+            'name': _('Archivieren nach Tagen'),
+            'description': _('Abgeschlossene Leihvorgänge nach so vielen Tagen ins Archiv verschieben (0 = nie)'),
+            'validator': int,
+            'default': 365,
+        },
+        'BARCODE_LOAN_LOOKUP': {
+            'name': _('Leihvorgang per Barcode'),
+            'description': _('Beim Scannen verliehener Artikel den zugehörigen Leihvorgang anzeigen (Rückgabe nur über den Rückgabeplatz)'),
+            'validator': bool,
+            'default': False,
+        },
         # Example of existing setting:
         'CUSTOM_VALUE': {
              'name': 'Custom Value',
@@ -78,83 +168,614 @@ class meinplugin(ScheduleMixin, SettingsMixin, UserInterfaceMixin, NavigationMix
         # Add more settings as needed (e.g., default loan duration, notification settings)
     }
 
-    # ScheduleMixin placeholder
-    SCHEDULED_TASKS = {}
+    # Scheduled tasks (from ScheduleMixin)
+    SCHEDULED_TASKS = {
+        # Set the stored OVERDUE status, so lists and filters don't compute it per row
+        'overdue_sweep': {
+            'func': 'meinplugin.tasks.update_overdue_loans',
+            'schedule': 'I', # Interval
+            'minutes': 15,
+        },
+        # Move old RETURNED / CANCELLED loans to the archive tables
+        'archive_closed': {
+            'func': 'meinplugin.tasks.archive_closed_loans',
+            'schedule': 'D', # Daily
+        },
+        # Forget idempotency keys of old POSTs
+        'purge_idempotency_keys': {
+            'func': 'meinplugin.tasks.purge_idempotency_keys',
+            'schedule': 'D',
+        },
+        # Pick up background issue / return jobs which got stuck (e.g. worker crash)
+        'resume_jobs': {
+            'func': 'meinplugin.tasks.resume_loan_jobs',
+            'schedule': 'I',
+            'minutes': 10,
+        },
+    }
+
+    # Panels on the StockItem and Part pages (from UserInterfaceMixin)
+    def get_ui_panels(self, request, context: dict, **kwargs):
+        """Adds the loan history panel to StockItem and Part detail pages."""
+        target_model = context.get('target_model')
+        target_id = context.get('target_id')
 
-    # UserInterfaceMixin placeholder (can be used later to add info to StockItem page)
+        if target_model == 'stockitem' and target_id:
+            records = self.loan_history(target_id)
+            description = _('Leihhistorie dieses Artikels')
+        elif target_model == 'part' and target_id:
+            records = self.part_active_loans(target_id)
+            description = _('Aktuell verliehene Artikel dieses Teils')
+        else:
+            return []
 
-    # --- Placeholder for Core Logic ---
-    # These functions would handle the stock movement.
-    # They would likely be called from the Views (e.g., form_valid).
+        # Items which were never loaned don't get an (empty) panel
+        if not records:
+            return []
 
-    def issue_loan_item(self, loaned_item: 'LoanedItem', user: 'InvenTreeUser'):
-         """Moves the StockItem to the designated loan location."""
-         loan_location_pk = self.get_setting('LOAN_LOCATION')
-         if not loan_location_pk:
-             raise ValueError("Loan Location setting is not configured.")
-         try:
-             loan_location = StockLocation.objects.get(pk=loan_location_pk)
-         except StockLocation.DoesNotExist:
-             raise ValueError(f"Configured Loan Location (PK={loan_location_pk}) not found.")
-
-         stock_item = loaned_item.stock_item
-
-         # *** CORE LOGIC NEEDED HERE ***
-         # Use InvenTree's internal API/functions to perform a stock transfer:
-         # - Find the function like 'perform_stock_transfer' or similar.
-         # - Parameters likely needed: stock_item, destination_location (loan_location),
-         #   quantity (use stock_item.quantity), user performing action.
-         # - Add notes to the transfer indicating it's for Loan #loaned_item.loan.pk.
-         # - Handle potential errors (e.g., item not in expected location, insufficient permissions).
-         print(f"Simulating: Transfer StockItem {stock_item.pk} to Location {loan_location.pk} for Loan {loaned_item.loan.pk}") # Placeholder
-
-         # If transfer is successful:
-         loaned_item.status = LoanedItem.ItemStatus.ON_LOAN
-         loaned_item.save()
-         # Optionally update Loan status if all items are now ON_LOAN
-
-         return True # Indicate success
+        today = date.today().isoformat()
+        for row in records:
+            # Computed per request, the cached rows don't age
+            row['overdue'] = row['item_status'] == LoanedItem.ItemStatus.ON_LOAN and row['due_date'] < today
+
+        return [{
+            'key': 'loan-history',
+            'title': str(_('Leihvorgänge')),
+            'description': str(description),
+            'icon': 'ti:handshake:outline',
+            'source': self.plugin_static_file('LoanHistoryPanel.js:renderLoanHistoryPanel'),
+            'context': {
+                'mode': target_model,
+                'records': records,
+                # Only an issued item is "out" - reservations are listed, but not announced
+                'active': next((row for row in records if row['item_status'] == LoanedItem.ItemStatus.ON_LOAN), None),
+            },
+        }]
+
+    # Dashboard items (from UserInterfaceMixin)
+    def get_ui_dashboard_items(self, request, context: dict, **kwargs):
+        """Open / overdue loans per customer, read from the CustomerLoanSummary table."""
+        if not request.user.is_authenticated:
+            return []
+
+        customers = [
+            {
+                'customer': summary.customer_id,
+                'name': summary.customer.name,
+                'pending_loans': summary.pending_loans,
+                'active_loans': summary.active_loans,
+                'overdue_loans': summary.overdue_loans,
+                'items_on_loan': summary.items_on_loan,
+            }
+            for summary in CustomerLoanSummary.with_open_loans()[:DASHBOARD_CUSTOMER_LIMIT]
+        ]
+
+        return [{
+            'key': 'loan-customer-summary',
+            'title': str(_('Leihvorgänge nach Kunde')),
+            'description': str(_('Offene und überfällige Leihvorgänge je Kunde')),
+            'icon': 'ti:handshake:outline',
+            'source': self.plugin_static_file('LoanSummaryDashboard.js:renderLoanSummaryDashboard'),
+            'context': {
+                'totals': CustomerLoanSummary.totals(),
+                'customers': customers,
+                'list_url': reverse('plugin:loan:loan_list'),
+            },
+        }]
+
+    @staticmethod
+    def _loan_record_row(record, with_serial=False):
+        """Panel row of a LoanedItem (with loan and customer already loaded) - JSON safe."""
+        loan = record.loan
+        return {
+            'loan': loan.pk,
+            'reference': loan.reference,
+            'customer': loan.customer.name if loan.customer_id else None,
+            'serial': record.stock_item.serial if with_serial else None,
+            'start_date': loan.start_date.isoformat(),
+            'due_date': loan.due_date.isoformat(),
+            'return_date': loan.return_date.isoformat() if loan.return_date else None,
+            'loan_status': loan.status,
+            'item_status': record.status,
+            'url': reverse('plugin:loan:loan_detail', kwargs={'pk': loan.pk}),
+        }
+
+    def loan_history(self, stock_item):
+        """
+        Loan records of a StockItem, newest first, as panel rows.
+
+        One query on the LoanedItem(stock_item, status) index with loan and customer
+        joined in; the result is cached per StockItem (see caching.get_stock_loan_history).
+        """
+        stock_item_pk = getattr(stock_item, 'pk', stock_item)
+
+        def build():
+            records = (
+                LoanedItem.objects.filter(stock_item_id=stock_item_pk)
+                .select_related('loan', 'loan__customer')
+                .only(
+                    'status', 'loan', 'loan__customer', 'loan__reference', 'loan__start_date', 'loan__due_date',
+                    'loan__return_date', 'loan__status', 'loan__customer__name',
+                )
+                .order_by('-loan__start_date', '-pk')[:LOAN_HISTORY_LIMIT]
+            )
+            return [self._loan_record_row(record) for record in records]
+
+        return get_stock_loan_history(stock_item_pk, build)
+
+    def part_active_loans(self, part):
+        """Open loan records (PENDING / ON_LOAN) of all StockItems of a Part - one query, not cached."""
+        part_pk = getattr(part, 'pk', part)
+        records = (
+            LoanedItem.objects.active().filter(stock_item__part_id=part_pk)
+            .select_related('loan', 'loan__customer', 'stock_item')
+            .only(
+                'status', 'stock_item', 'stock_item__serial', 'loan', 'loan__customer', 'loan__reference', 'loan__start_date', 'loan__due_date',
+                'loan__return_date', 'loan__status', 'loan__customer__name',
+            )
+            .order_by('loan__due_date', 'pk')[:LOAN_HISTORY_LIMIT]
+        )
+        return [self._loan_record_row(record, with_serial=True) for record in records]
+
+    # Barcode hook (from BarcodeMixin)
+    def scan(self, barcode_data):
+        """
+        Identifies a scanned StockItem which is on loan, together with its loan.
+
+        Read-only - a scan never moves stock, returns are booked at the returns desk
+        (ReturnDeskView). Only active if BARCODE_LOAN_LOOKUP is enabled. Barcodes which
+        don't belong to an item on loan return None, so other barcode plugins can handle them.
+        """
+        if not self.get_setting('BARCODE_LOAN_LOOKUP'):
+            return None
+
+        loaned_item = self.find_loaned_item(barcode_data)
+        if loaned_item is None:
+            return None
+
+        stock_item = loaned_item.stock_item
+        return {
+            'success': f"{stock_item.serial} is on Loan #{loaned_item.loan_id}",
+            'stockitem': {'pk': stock_item.pk, 'serial': stock_item.serial},
+            'loan': {'pk': loaned_item.loan_id, 'url': loaned_item.loan.get_absolute_url()},
+        }
+
+    # --- Core Logic ---
+    # These functions handle the stock movement.
+    # They are called from the Views (e.g., LoanDetailView.post).
+
+    def _get_loan_location(self):
+        """Resolves the configured loan location (raises ValueError if it is unusable)."""
+        return self._get_location_setting('LOAN_LOCATION')
+
+    def _get_location_setting(self, key):
+        """
+        Resolves a StockLocation setting (raises ValueError if it is unusable).
+
+        The result - including a missing or unconfigured location - is cached per
+        process, so the setting and the StockLocation are only queried once per TTL.
+        """
+        entry = _loan_location_cache.get(key)
+        if entry is None or entry['expires'] < time.monotonic():
+            entry = self._resolve_location_setting(key)
+            _loan_location_cache[key] = entry
+
+        if entry['error']:
+            raise ValueError(entry['error'])
+        return entry['location']
+
+    def _resolve_location_setting(self, key):
+        """Reads a StockLocation setting and builds a new cache entry for it."""
+        loan_location_pk = self.get_setting(key)
+        loan_location = None
+        error = None
+
+        if not loan_location_pk:
+            error = f"Setting {key} is not configured."
+        else:
+            try:
+                loan_location = StockLocation.objects.get(pk=loan_location_pk)
+            except (StockLocation.DoesNotExist, ValueError):
+                error = f"Configured location for {key} (PK={loan_location_pk}) not found."
+
+        if error:
+            # Reported once here, later calls fail from the cache until it is invalidated
+            logger.error("LoanPlugin: %s", error)
+
+        return {
+            'location': loan_location,
+            'location_pk': loan_location.pk if loan_location else None,
+            'error': error,
+            'expires': time.monotonic() + LOAN_LOCATION_CACHE_TTL,
+        }
+
+    @instrumented('core._transfer_stock_items')
+    def _transfer_stock_items(self, stock_item_pks, location, user, notes=''):
+        """
+        Moves several StockItems to 'location' in one go.
+
+        The location is written with a single UPDATE and the stock tracking entries
+        are added with one bulk_create (instead of StockItem.move() per item).
+        """
+        if not stock_item_pks:
+            return 0
+
+        moved = StockItem.objects.filter(pk__in=stock_item_pks).update(location=location)
 
+        now = timezone.now()
+        StockItemTracking.objects.bulk_create([
+            StockItemTracking(
+                item_id=pk,
+                tracking_type=StockHistoryCode.STOCK_MOVE.value,
+                user=user,
+                date=now,
+                notes=notes,
+                deltas={'location': location.pk},
+            )
+            for pk in stock_item_pks
+        ])
+
+        return moved
+
+    def _lock_loaned_items(self, queryset):
+        """
+        Locks the LoanedItems of 'queryset' and their StockItems (call inside a transaction).
+
+        Returns rows (pk, (customer_pk, loan_pk), stock_item_pk, stock location_pk), grouped by
+        loan in (customer, loan) order - the order in which the callers then update Loan and
+        CustomerLoanSummary rows.
+        Locks are always taken in the same order - LoanedItems by pk, then StockItems by pk,
+        then loans by (customer, loan) - so overlapping batches wait for each other instead
+        of deadlocking. A batch which had to wait re-checks the item status after the other
+        one committed (PostgreSQL / MySQL re-evaluate the WHERE of locked rows) and skips
+        the items which were already processed.
+        """
+        if connection.features.has_select_for_update_of:
+            rows = list(
+                queryset.select_for_update(of=('self',)).order_by('pk')
+                .values_list('pk', 'loan__customer_id', 'loan_id', 'stock_item_id')
+            )
+        else:
+            # MariaDB / MySQL < 8.0.1: no FOR UPDATE OF - a join would lock the Loan rows
+            # too, so lock the items alone and read the customers with a second query
+            items = list(
+                queryset.select_for_update().order_by('pk').values_list('pk', 'loan_id', 'stock_item_id')
+            )
+            customers = dict(
+                Loan.objects.filter(pk__in={row[1] for row in items}).values_list('pk', 'customer_id')
+            )
+            rows = [(pk, customers.get(loan_pk), loan_pk, stock_item_pk) for pk, loan_pk, stock_item_pk in items]
+        if not rows:
+            return []
+
+        locations = dict(
+            StockItem.objects.select_for_update().filter(pk__in=[row[3] for row in rows])
+            .order_by('pk').values_list('pk', 'location_id')
+        )
+
+        rows.sort(key=lambda row: (row[1], row[2], row[0]))
+        return [
+            (pk, (customer_pk, loan_pk), stock_item_pk, locations.get(stock_item_pk))
+            for pk, customer_pk, loan_pk, stock_item_pk in rows
+        ]
+
+    @instrumented('core.issue_loan_items')
+    def issue_loan_items(self, loaned_items, user: 'InvenTreeUser'):
+        """
+        Moves the StockItems of several LoanedItems to the loan location.
+
+        The loan location is resolved once, the stock is moved in bulk and the item
+        statuses are written with one UPDATE, all inside one transaction. Each affected
+        Loan has its status updated once at the end.
+        Items which are not PENDING are skipped. Returns the number of issued items.
+        Safe against concurrent calls for the same items, see _lock_loaned_items().
+        """
+        loan_location = self._get_loan_location()
+
+        with transaction.atomic():
+            # Items still out on another loan (this loan was a reservation) are skipped
+            rows = self._lock_loaned_items(
+                LoanedItem.objects.filter(
+                    pk__in=[item.pk for item in loaned_items],
+                    status=LoanedItem.ItemStatus.PENDING,
+                ).exclude(
+                    Exists(LoanedItem.objects.filter(
+                        stock_item=OuterRef('stock_item'), status=LoanedItem.ItemStatus.ON_LOAN
+                    ))
+                )
+            )
+            if not rows:
+                return 0
+
+            stock_by_loan = {}
+            for _pk, loan_key, stock_item_pk, _location_pk in rows:
+                stock_by_loan.setdefault(loan_key, []).append(stock_item_pk)
+
+            for (_customer_pk, loan_pk), stock_item_pks in stock_by_loan.items():
+                self._transfer_stock_items(stock_item_pks, loan_location, user, notes=f"Issued for Loan #{loan_pk}")
+
+            item_pks = [row[0] for row in rows]
+            LoanedItem.objects.filter(pk__in=item_pks).update(status=LoanedItem.ItemStatus.ON_LOAN)
+
+            # bulk update() bypasses LoanedItem.save(), so adjust the counters here
+            for (_customer_pk, loan_pk), stock_item_pks in stock_by_loan.items():
+                count = len(stock_item_pks)
+                Loan.apply_item_deltas(loan_pk, {
+                    LoanedItem.ItemStatus.PENDING: -count,
+                    LoanedItem.ItemStatus.ON_LOAN: count,
+                })
+                Loan.sync_status(loan_pk)
+
+        # Keep the passed objects in sync with the database
+        issued = set(item_pks)
+        for item in loaned_items:
+            if item.pk in issued:
+                item.status = LoanedItem.ItemStatus.ON_LOAN
+
+        return len(rows)
+
+    @instrumented('core.return_loan_items')
+    def return_loan_items(self, loaned_items, return_location: StockLocation, user: 'InvenTreeUser'):
+        """
+        Moves the StockItems of several LoanedItems back to 'return_location'.
+
+        Works like issue_loan_items(): one location lookup, one bulk stock move and one
+        status UPDATE inside a single transaction, Loan status updated once per loan.
+        Items which are not ON_LOAN are skipped. Returns the number of returned items.
+        Safe against concurrent calls for the same items, see _lock_loaned_items().
+        """
+        loan_location = self._get_loan_location()
+
+        with transaction.atomic():
+            rows = self._lock_loaned_items(
+                LoanedItem.objects.filter(
+                    pk__in=[item.pk for item in loaned_items],
+                    status=LoanedItem.ItemStatus.ON_LOAN,
+                )
+            )
+            if not rows:
+                return 0
+
+            stock_by_loan = {}
+            for _pk, loan_key, stock_item_pk, location_pk in rows:
+                # Sanity check: Is the item actually at the loan location?
+                if location_pk != loan_location.pk:
+                    # Maybe it was moved elsewhere in the meantime - mark it returned anyway
+                    logger.warning("LoanPlugin: StockItem %s is not at the expected loan location %s",
+                                   stock_item_pk, loan_location.pk)
+                stock_by_loan.setdefault(loan_key, []).append(stock_item_pk)
+
+            for (_customer_pk, loan_pk), stock_item_pks in stock_by_loan.items():
+                self._transfer_stock_items(stock_item_pks, return_location, user, notes=f"Returned from Loan #{loan_pk}")
+
+            item_pks = [row[0] for row in rows]
+            LoanedItem.objects.filter(pk__in=item_pks).update(status=LoanedItem.ItemStatus.RETURNED)
+
+            # Adjust the counters and update the main Loan status if all items are returned
+            for (_customer_pk, loan_pk), stock_item_pks in stock_by_loan.items():
+                count = len(stock_item_pks)
+                Loan.apply_item_deltas(loan_pk, {
+                    LoanedItem.ItemStatus.ON_LOAN: -count,
+                    LoanedItem.ItemStatus.RETURNED: count,
+                })
+                Loan.sync_status(loan_pk)
+
+        returned = set(item_pks)
+        for item in loaned_items:
+            if item.pk in returned:
+                item.status = LoanedItem.ItemStatus.RETURNED
+
+        return len(rows)
+
+    @instrumented('core.add_items_to_loan')
+    def add_items_to_loan(self, loan: 'Loan', identifiers):
+        """
+        Adds StockItems, given by serial number or pk, to an open loan in one batch.
+
+        All identifiers are resolved with one query (which also checks availability),
+        active-loan conflicts are checked with one more, and the LoanedItems are written
+        with a single bulk_create. Identifiers which can't be added are reported
+        individually and don't stop the rest of the batch.
+        Returns (list of created LoanedItems, {identifier: error message}).
+        """
+        errors = {}
+
+        # Strip and de-duplicate, keeping the scan order
+        tokens = list(dict.fromkeys(str(token).strip() for token in identifiers if str(token).strip()))
+        if not tokens:
+            return [], errors
+
+        if not loan.is_open:
+            raise ValueError("Items can only be added to open loans.")
+
+        pk_tokens = [int(token) for token in tokens if token.isdigit()]
+        candidates = (
+            StockItem.objects.filter(serial__isnull=False).exclude(serial='')
+            .filter(Q(serial__in=tokens) | Q(pk__in=pk_tokens))
+            .annotate(available=Case(
+                When(StockItem.IN_STOCK_FILTER, then=Value(True)),
+                default=Value(False), output_field=BooleanField(),
+            ))
+            .values_list('pk', 'serial', 'available')
+        )
+
+        by_serial = {}
+        by_pk = {}
+        for pk, serial, available in candidates:
+            by_serial.setdefault(serial, []).append(pk)
+            by_pk[pk] = available
+
+        # Resolve each identifier - a serial number wins over a pk with the same digits
+        resolved = {}
+        for token in tokens:
+            matches = by_serial.get(token, [])
+            if len(matches) > 1:
+                errors[token] = "Serial number is ambiguous, use the stock item PK."
+            elif matches:
+                resolved[token] = matches[0]
+            elif token.isdigit() and int(token) in by_pk:
+                resolved[token] = int(token)
+            else:
+                errors[token] = "No serialized stock item found."
+
+        # Conflicts are bookings of the same items which overlap this loan's dates
+        active_loans = LoanedItem.objects.busy_stock_items(resolved.values(), loan.start_date, loan.due_date)
+
+        new_items = []
+        seen = set()
+        for token, stock_item_pk in resolved.items():
+            if stock_item_pk in seen:
+                errors[token] = "Duplicate stock item in this batch."
+            elif stock_item_pk in active_loans:
+                if active_loans[stock_item_pk] == loan.pk:
+                    errors[token] = "Already on this loan."
+                else:
+                    errors[token] = f"Booked on Loan #{active_loans[stock_item_pk]} in this period."
+            elif not by_pk[stock_item_pk]:
+                errors[token] = "Stock item is not available."
+            else:
+                seen.add(stock_item_pk)
+                new_items.append(LoanedItem(
+                    loan=loan,
+                    stock_item_id=stock_item_pk,
+                    status=LoanedItem.ItemStatus.PENDING, # Starts as pending
+                ))
+
+        if not new_items:
+            return [], errors
+
+        try:
+            with transaction.atomic():
+                created = LoanedItem.objects.bulk_create(new_items)
+                # bulk_create bypasses LoanedItem.save(), so adjust the counters here
+                Loan.apply_item_deltas(loan.pk, {LoanedItem.ItemStatus.PENDING: len(created)})
+                invalidate_stock_loan_history(*(item.stock_item_id for item in created))
+        except IntegrityError:
+            # Someone else put one of the items on a loan in the meantime
+            for token, stock_item_pk in resolved.items():
+                if stock_item_pk in seen:
+                    errors[token] = "Conflicting change, please scan again."
+            return [], errors
+
+        return created, errors
+
+    def find_loaned_item(self, barcode_data):
+        """
+        Resolves barcode data to the LoanedItem which is currently ON_LOAN.
+
+        Accepts InvenTree stock item barcodes ({"stockitem": <pk>}, as dict or JSON)
+        or a plain serial number. One indexed query; None if nothing (or more than one
+        item, for serials shared between parts) matches.
+        """
+        # Only JSON objects are decoded - serials like "1e3" or "0012" must stay strings
+        if isinstance(barcode_data, str) and barcode_data.strip().startswith('{'):
+            try:
+                barcode_data = json.loads(barcode_data)
+            except ValueError:
+                return None
+
+        loaned_items = LoanedItem.objects.filter(status=LoanedItem.ItemStatus.ON_LOAN)
+        if isinstance(barcode_data, dict):
+            stock_item_pk = barcode_data.get('stockitem')
+            if not str(stock_item_pk).isdigit():
+                return None
+            loaned_items = loaned_items.filter(stock_item_id=int(stock_item_pk))
+        elif isinstance(barcode_data, (str, int)) and str(barcode_data).strip():
+            loaned_items = loaned_items.filter(stock_item__serial=str(barcode_data).strip())
+        else:
+            return None
+
+        matches = list(loaned_items.select_related('stock_item', 'loan')[:2])
+        return matches[0] if len(matches) == 1 else None
+
+    def return_scanned_item(self, loaned_item, user, return_location=None):
+        """
+        Returns a scanned LoanedItem via return_loan_item().
+
+        Uses DEFAULT_RETURN_LOCATION unless a return location is given.
+        Returns a response dict in the format of InvenTree's barcode API.
+        """
+        stock_item = loaned_item.stock_item
+        try:
+            if return_location is None:
+                return_location = self._get_location_setting('DEFAULT_RETURN_LOCATION')
+            self.return_loan_item(loaned_item, return_location, user)
+        except ValueError as e:
+            return {'error': str(e), 'stockitem': {'pk': stock_item.pk}}
+
+        return {
+            'success': f"Returned {stock_item.serial} from Loan #{loaned_item.loan_id} to {return_location.name}",
+            'stockitem': {'pk': stock_item.pk, 'serial': stock_item.serial},
+            'loan': {'pk': loaned_item.loan_id},
+            'location': {'pk': return_location.pk, 'name': return_location.name},
+        }
+
+    def available_stock_items(self, part, start, end):
+        """
+        Serialized StockItems of 'part' and whether they are free from 'start' to 'end'.
+
+        Two queries no matter how many items the part has: one for the items and one
+        interval overlap query for all their bookings.
+        Returns a list of {'pk', 'serial', 'available', 'loan'} dicts.
+        """
+        part_pk = getattr(part, 'pk', part)
+        stock_items = list(
+            StockItem.objects.filter(part_id=part_pk, serial__isnull=False).exclude(serial='')
+            .filter(StockItem.IN_STOCK_FILTER)
+            .order_by('serial_int', 'serial').values_list('pk', 'serial')
+        )
+        busy = dict(
+            LoanedItem.objects.overlapping(start, end).filter(stock_item__part_id=part_pk)
+            .values_list('stock_item_id', 'loan_id')
+        )
+        return [
+            {'pk': pk, 'serial': serial, 'available': pk not in busy, 'loan': busy.get(pk)}
+            for pk, serial in stock_items
+        ]
+
+    def is_on_loan(self, stock_item):
+        """True if the StockItem (instance or pk) is currently issued on a loan."""
+        return LoanedItem.objects.is_on_loan(stock_item)
+
+    def active_loan_for(self, stock_items):
+        """Maps StockItem pk -> Loan pk for the given StockItems which are currently issued."""
+        return LoanedItem.objects.active_loan_for(stock_items)
+
+    def runs_in_background(self, item_count):
+        """True if an issue / return of 'item_count' items should go to the background worker."""
+        try:
+            threshold = int(self.get_setting('BACKGROUND_THRESHOLD'))
+        except (TypeError, ValueError):
+            return False
+        return item_count > threshold
+
+    def start_loan_job(self, loan, action, loaned_items, user, return_location=None):
+        """
+        Queues an issue / return of 'loaned_items' on InvenTree's background worker.
+
+        Returns the LoanJob, whose progress can be polled (see LoanJobProgressView).
+        """
+        from InvenTree.tasks import offload_task
+
+        item_pks = [item.pk for item in loaned_items]
+        job = LoanJob.objects.create(
+            loan=loan,
+            action=action,
+            item_pks=item_pks,
+            total=len(item_pks),
+            return_location=return_location,
+            user=user,
+        )
+        # Only queue once the job row is visible to the worker
+        transaction.on_commit(lambda: offload_task('meinplugin.tasks.run_loan_job', job.pk))
+        return job
+
+    @instrumented('core.issue_loan_item')
+    def issue_loan_item(self, loaned_item: 'LoanedItem', user: 'InvenTreeUser'):
+        """Moves the StockItem to the designated loan location."""
+        return self.issue_loan_items([loaned_item], user) == 1
 
+    @instrumented('core.return_loan_item')
     def return_loan_item(self, loaned_item: 'LoanedItem', return_location: StockLocation, user: 'InvenTreeUser'):
-         """Moves the StockItem back from the loan location to a specified return location."""
-         loan_location_pk = self.get_setting('LOAN_LOCATION')
-         if not loan_location_pk:
-             raise ValueError("Loan Location setting is not configured.")
-         try:
-             loan_location = StockLocation.objects.get(pk=loan_location_pk)
-         except StockLocation.DoesNotExist:
-             raise ValueError(f"Configured Loan Location (PK={loan_location_pk}) not found.")
-
-         stock_item = loaned_item.stock_item
-
-         # Sanity check: Is the item actually at the loan location?
-         if stock_item.location != loan_location:
-             # Handle this error - maybe it was already returned or moved elsewhere?
-             print(f"Warning: StockItem {stock_item.pk} is not at the expected Loan Location {loan_location.pk}.")
-             # Decide how to proceed - maybe still mark as returned? Or raise error?
-             # For now, we'll proceed cautiously and assume it needs marking returned.
-             # In a real implementation, raise an error or provide user feedback.
-
-         # *** CORE LOGIC NEEDED HERE ***
-         # Use InvenTree's internal API/functions to perform a stock transfer:
-         # - Find the function like 'perform_stock_transfer'.
-         # - Parameters: stock_item, destination_location (return_location),
-         #   quantity, user.
-         # - Add notes indicating return from Loan #loaned_item.loan.pk.
-         # - Handle potential errors.
-         print(f"Simulating: Transfer StockItem {stock_item.pk} FROM Location {loan_location.pk} TO {return_location.pk} for Loan {loaned_item.loan.pk}") # Placeholder
-
-         # If transfer is successful (or we decide to mark as returned anyway):
-         loaned_item.status = LoanedItem.ItemStatus.RETURNED
-         loaned_item.save()
-
-         # Update the main Loan status if all items are returned
-         loan = loaned_item.loan
-         if all(item.status == LoanedItem.ItemStatus.RETURNED for item in loan.items.all()):
-             from datetime import date
-             loan.status = Loan.LoanStatus.RETURNED
-             loan.return_date = date.today() # Set actual return date
-             loan.save()
-
-         return True # Indicate success
\ No newline at end of file
+        """Moves the StockItem back from the loan location to a specified return location."""
+        return self.return_loan_items([loaned_item], return_location, user) == 1
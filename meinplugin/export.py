@@ -0,0 +1,99 @@
+# meinplugin/export.py
+"""
+Export of the loan history (one row per LoanedItem).
+
+Rows are read with values_list().iterator(chunk_size=...), i.e. server-side cursors on
+PostgreSQL, and written out as they come, so memory use doesn't grow with the export size.
+"""
+import csv
+import tempfile
+from datetime import date
+
+from .models import Loan, LoanedItem
+
+# Number of rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# (column header, LoanedItem lookup)
+EXPORT_COLUMNS = [
+    ('Loan', 'loan_id'),
+    ('Customer', 'loan__customer__name'),
+    ('Reference', 'loan__reference'),
+    ('Loan Date', 'loan__loan_date'),
+    ('Due Date', 'loan__due_date'),
+    ('Return Date', 'loan__return_date'),
+    ('Loan Status', 'loan__status'),
+    ('Part', 'stock_item__part__name'),
+    ('IPN', 'stock_item__part__IPN'),
+    ('Serial', 'stock_item__serial'),
+    ('Item Status', 'status'),
+]
+
+
+def export_queryset(params):
+    """
+    LoanedItem rows for the export, filtered by 'params' (e.g. request.GET).
+
+    Filters: the loan list filters (status, customer, due_after, due_before - see
+    filter_loans(), so an export from the filtered list matches the list) and
+    date_from / date_to (loan date, YYYY-MM-DD).
+    Invalid values raise ValueError (answered with 400 by LoanExportView).
+    """
+    from .views import filter_loans
+
+    loans = filter_loans(Loan.objects.order_by(), params)
+    if params.get('date_from'):
+        loans = loans.filter(loan_date__date__gte=date.fromisoformat(params['date_from']))
+    if params.get('date_to'):
+        loans = loans.filter(loan_date__date__lte=date.fromisoformat(params['date_to']))
+
+    queryset = LoanedItem.objects.filter(loan__in=loans.values('pk'))
+    return queryset.order_by('loan_id', 'pk').values_list(*[lookup for _header, lookup in EXPORT_COLUMNS])
+
+
+def iter_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the header row and then every data row of 'queryset'."""
+    yield [header for header, _lookup in EXPORT_COLUMNS]
+    yield from queryset.iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object which hands back what is written (for csv.writer in a generator)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yields the CSV lines for 'rows' one by one (for StreamingHttpResponse)."""
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows):
+    """
+    Writes 'rows' into an XLSX file and returns it (rewound).
+
+    XLSX can't be streamed as it is generated, so openpyxl's write-only mode writes the
+    rows to a temporary file on disk instead of keeping the workbook in memory.
+    Raises ImportError if openpyxl is not installed.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Loans')
+    for row in rows:
+        sheet.append([_xlsx_value(value) for value in row])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _xlsx_value(value):
+    """openpyxl can't store timezone aware datetimes."""
+    if getattr(value, 'tzinfo', None) is not None:
+        return value.replace(tzinfo=None)
+    return value
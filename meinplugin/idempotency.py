@@ -0,0 +1,67 @@
+# meinplugin/idempotency.py
+"""
+Idempotency keys for issue / return POSTs.
+
+A client sends a key with each action (form field 'idempotency_key' or the
+'Idempotency-Key' header). The key is claimed in the same transaction as the action, so
+the action commits at most once per key: a concurrent duplicate waits on the unique index
+until the first request is done and is then answered as a replay. Failed actions don't
+keep their key.
+"""
+import uuid
+
+from django.db import transaction
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+# Keys older than this are deleted by the purge task
+IDEMPOTENCY_KEY_HOURS = 24
+
+# Max. length of a client key (IdempotencyKey.key)
+MAX_KEY_LENGTH = 100
+
+
+def new_key():
+    """A fresh key for a rendered form."""
+    return uuid.uuid4().hex
+
+
+def claim(user, key):
+    """
+    Records 'key' for 'user' (call inside the action's transaction).
+
+    Returns (record, created) - 'created' is False if the key was used before.
+    """
+    return IdempotencyKey.objects.get_or_create(user=user, key=key[:MAX_KEY_LENGTH])
+
+
+def idempotent_response(request, handler):
+    """
+    Runs the DRF 'handler()' once per key of 'request' and stores its response.
+
+    A repeated key returns the stored response with an 'Idempotent-Replayed' header.
+    Only successful (2xx) responses are stored - a failed action rolls back the claim, so
+    a retry with the same key runs the action again. Requests without a key are handled normally.
+    """
+    key = request.headers.get('Idempotency-Key')
+    if not key and isinstance(request.data, dict):
+        key = request.data.get('idempotency_key')
+    if not key:
+        return handler()
+
+    with transaction.atomic():
+        record, created = claim(request.user, str(key))
+        if not created:
+            return Response(record.response, status=record.status_code or 200,
+                            headers={'Idempotent-Replayed': 'true'})
+
+        response = handler()
+        if not 200 <= response.status_code < 300:
+            transaction.set_rollback(True)
+            return response
+
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=['status_code', 'response'])
+        return response
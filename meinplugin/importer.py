@@ -0,0 +1,243 @@
+# meinplugin/importer.py
+"""
+Bulk import of loans from CSV (one row per loaned item).
+
+Columns:
+    customer   - customer company name or pk (required)
+    due_date   - YYYY-MM-DD (required)
+    serial     - serial number of the stock item (required)
+    reference  - optional loan reference
+    loan_date  - optional YYYY-MM-DD, defaults to the import date
+    status     - optional item status (PENDING, ON_LOAN, RETURNED), default PENDING
+    return_date - optional YYYY-MM-DD for RETURNED items, the loan's return date is the latest
+                  one of its rows (defaults to the import date)
+
+Rows with the same customer, reference, loan date and due date form one Loan.
+The file is read row by row and processed in chunks: customers and serials of a chunk are
+resolved with one query each, conflicts with items already on loan are checked as a set,
+and the Loans and LoanedItems are written with bulk_create inside one transaction per chunk.
+The rows of a loan may be spread over several chunks, so the loan statuses and the customer
+summaries are only derived once all rows are written.
+No stock is moved - the import records the state from the legacy system as it is.
+"""
+import csv
+from datetime import date, datetime, time
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from company.models import Company
+from stock.models import StockItem
+
+from .caching import invalidate_stock_loan_history
+from .models import CustomerLoanSummary, Loan, LoanedItem
+
+IMPORT_CHUNK_SIZE = 500
+
+REQUIRED_COLUMNS = ('customer', 'due_date', 'serial')
+
+
+class LoanImporter:
+    """
+    Imports loans from a CSV text stream.
+
+    With dry_run=True everything is validated but nothing is written.
+    After run(), 'errors' holds (row number, message) for every row which was skipped.
+    """
+
+    def __init__(self, user=None, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+
+        self.errors = []
+        self.loans_created = 0
+        self.items_created = 0
+
+        # Loan key -> Loan pk (or a placeholder in dry run mode), kept across chunks
+        self._loans = {}
+        # StockItems which are imported as ON_LOAN by this import
+        self._active_stock_items = set()
+        # Loan key -> latest return_date of its rows
+        self._return_dates = {}
+
+    def run(self, text_stream):
+        """Imports all rows of 'text_stream' (an open text file). Returns self."""
+        reader = csv.DictReader(text_stream)
+
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            self.errors.append((1, f"Missing column(s): {', '.join(missing)}"))
+            return self
+
+        # Data rows start at line 2 (after the header)
+        rows = enumerate(reader, start=2)
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk)
+        finally:
+            # Also for the chunks written before an error
+            if not self.dry_run:
+                self._finish()
+
+        return self
+
+    def _parse_row(self, row):
+        """Returns the cleaned values of a CSV row (raises ValueError)."""
+        customer = (row.get('customer') or '').strip()
+        serial = (row.get('serial') or '').strip()
+        if not customer or not serial:
+            raise ValueError("customer and serial are required")
+
+        status = (row.get('status') or LoanedItem.ItemStatus.PENDING).strip().upper()
+        if status not in LoanedItem.ItemStatus.values:
+            raise ValueError(f"Invalid status '{status}'")
+
+        loan_date = (row.get('loan_date') or '').strip()
+        return_date = (row.get('return_date') or '').strip()
+        if return_date and status != LoanedItem.ItemStatus.RETURNED:
+            raise ValueError("return_date is only allowed for RETURNED items")
+
+        return {
+            'customer': customer,
+            'serial': serial,
+            'status': status,
+            'reference': (row.get('reference') or '').strip(),
+            'due_date': date.fromisoformat((row.get('due_date') or '').strip()),
+            'loan_date': date.fromisoformat(loan_date) if loan_date else None,
+            'return_date': date.fromisoformat(return_date) if return_date else None,
+        }
+
+    def _import_chunk(self, chunk):
+        parsed = []
+        for line, row in chunk:
+            try:
+                parsed.append((line, self._parse_row(row)))
+            except ValueError as e:
+                self.errors.append((line, str(e)))
+
+        if not parsed:
+            return
+
+        # Resolve customers (by name or pk) with one query
+        tokens = {values['customer'] for _line, values in parsed}
+        customers = {}
+        for pk, name in Company.objects.filter(is_customer=True).filter(
+            Q(name__in=tokens) | Q(pk__in=[int(token) for token in tokens if token.isdigit()])
+        ).values_list('pk', 'name'):
+            customers[name] = pk
+            customers.setdefault(str(pk), pk)
+
+        # Resolve serials with one query (serials are only unique per part)
+        stock_items = {}
+        for pk, serial in StockItem.objects.filter(
+            serial__in={values['serial'] for _line, values in parsed}
+        ).values_list('pk', 'serial'):
+            stock_items.setdefault(serial, []).append(pk)
+
+        # Check the issued items of the chunk against issued items in the database with one query
+        active_loans = LoanedItem.objects.active_loan_for(
+            stock_items[values['serial']][0] for _line, values in parsed
+            if values['status'] == LoanedItem.ItemStatus.ON_LOAN
+            and len(stock_items.get(values['serial'], [])) == 1
+        )
+
+        valid = []
+        for line, values in parsed:
+            customer_pk = customers.get(values['customer'])
+            matches = stock_items.get(values['serial'], [])
+            if customer_pk is None:
+                self.errors.append((line, f"Customer '{values['customer']}' not found"))
+            elif not matches:
+                self.errors.append((line, f"Serial '{values['serial']}' not found"))
+            elif len(matches) > 1:
+                self.errors.append((line, f"Serial '{values['serial']}' is ambiguous"))
+            elif values['status'] == LoanedItem.ItemStatus.ON_LOAN and (
+                matches[0] in active_loans or matches[0] in self._active_stock_items
+            ):
+                self.errors.append((line, f"Serial '{values['serial']}' is already on loan"))
+            else:
+                if values['status'] == LoanedItem.ItemStatus.ON_LOAN:
+                    self._active_stock_items.add(matches[0])
+                key = (customer_pk, values['reference'], values['loan_date'], values['due_date'])
+                valid.append((key, matches[0], values['status']))
+                if values['return_date'] is not None:
+                    self._return_dates[key] = max(values['return_date'], self._return_dates.get(key, date.min))
+
+        if self.dry_run:
+            new_keys = {key for key, _pk, _status in valid if key not in self._loans}
+            self._loans.update({key: None for key in new_keys})
+            self.loans_created += len(new_keys)
+            self.items_created += len(valid)
+            return
+
+        with transaction.atomic():
+            self._write_chunk(valid)
+
+    def _write_chunk(self, valid):
+        """Creates the Loans and LoanedItems of one chunk (inside a transaction)."""
+        new_keys = list(dict.fromkeys(key for key, _pk, _status in valid if key not in self._loans))
+        new_loans = Loan.objects.bulk_create([
+            Loan(
+                customer_id=customer_pk,
+                reference=reference,
+                start_date=loan_date or date.today(),
+                due_date=due_date,
+                created_by=self.user,
+                status=Loan.LoanStatus.PENDING,
+            )
+            for customer_pk, reference, loan_date, due_date in new_keys
+        ])
+        for key, loan in zip(new_keys, new_loans):
+            self._loans[key] = loan.pk
+
+        # loan_date is auto_now_add, so set the legacy dates afterwards (one UPDATE per date)
+        by_date = {}
+        for key, loan in zip(new_keys, new_loans):
+            if key[2] is not None:
+                by_date.setdefault(key[2], []).append(loan.pk)
+        for loan_date, pks in by_date.items():
+            Loan.objects.filter(pk__in=pks).update(
+                loan_date=timezone.make_aware(datetime.combine(loan_date, time()))
+            )
+
+        created = LoanedItem.objects.bulk_create([
+            LoanedItem(loan_id=self._loans[key], stock_item_id=stock_item_pk, status=status)
+            for key, stock_item_pk, status in valid
+        ])
+
+        # bulk_create bypasses LoanedItem.save(), so adjust the counters here
+        deltas = {}
+        for item in created:
+            loan_deltas = deltas.setdefault(item.loan_id, {})
+            loan_deltas[item.status] = loan_deltas.get(item.status, 0) + 1
+        for loan_pk, loan_deltas in deltas.items():
+            Loan.apply_item_deltas(loan_pk, loan_deltas)
+        invalidate_stock_loan_history(*(item.stock_item_id for item in created))
+
+        self.loans_created += len(new_loans)
+        self.items_created += len(created)
+
+    def _finish(self):
+        """Derives status (and return date) of every imported loan once, then the customer summaries."""
+        if not self._loans:
+            return
+
+        for loan_pk in self._loans.values():
+            Loan.sync_status(loan_pk)
+
+        # sync_status() dates returned loans to today - use the legacy dates (one UPDATE per date)
+        by_date = {}
+        for key, return_date in self._return_dates.items():
+            if key in self._loans:
+                by_date.setdefault(return_date, []).append(self._loans[key])
+        for return_date, pks in by_date.items():
+            Loan.objects.filter(pk__in=pks, status=Loan.LoanStatus.RETURNED).update(return_date=return_date)
+
+        # bulk_create sends no signals - recalculate the summaries of the new loans' customers
+        CustomerLoanSummary.rebuild({customer_pk for customer_pk, _ref, _date, _due in self._loans})
@@ -0,0 +1,162 @@
+# meinplugin/instrumentation.py
+"""
+Opt-in query and timing instrumentation for the plugin's views and stock operations.
+
+Enabled with the ENABLE_INSTRUMENTATION plugin setting. Code wrapped in instrument()
+(or decorated with @instrumented) records query count, DB time, total time and the
+slowest queries; the numbers are aggregated in-process into histograms and served by
+the staff-only InstrumentationView. Spans can be nested, e.g. a view and the
+get_context_data / template rendering inside it.
+"""
+import functools
+import heapq
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.db import connection
+
+# Upper bounds (ms) of the histogram buckets, anything slower goes into '+Inf'
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Number of slowest queries kept per span name
+SLOWEST_QUERIES = 5
+
+# How long the ENABLE_INSTRUMENTATION setting is cached (seconds)
+ENABLED_CACHE_TTL = 30
+
+_lock = threading.Lock()
+_stats = {} # span name -> aggregated numbers
+_local = threading.local() # stack of the active spans of this thread
+_enabled = {'value': False, 'expires': 0.0}
+
+
+def is_enabled():
+    """True if the ENABLE_INSTRUMENTATION setting is on (cached for a few seconds)."""
+    now = time.monotonic()
+    if _enabled['expires'] < now:
+        from plugin import registry
+
+        plugin = registry.get_plugin('loan')
+        _enabled['value'] = bool(plugin and plugin.get_setting('ENABLE_INSTRUMENTATION'))
+        _enabled['expires'] = now + ENABLED_CACHE_TTL
+    return _enabled['value']
+
+
+class Span:
+    """Numbers collected for one instrumented block."""
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.db_ms = 0.0
+        self.slowest = [] # min-heap of (duration ms, sql)
+
+    def add_query(self, duration_ms, sql):
+        self.queries += 1
+        self.db_ms += duration_ms
+        entry = (duration_ms, sql)
+        if len(self.slowest) < SLOWEST_QUERIES:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+
+def _record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: times a query for every active span."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        for span in getattr(_local, 'spans', []):
+            span.add_query(duration_ms, sql)
+
+
+def _bucket(total_ms):
+    for bound in HISTOGRAM_BUCKETS_MS:
+        if total_ms <= bound:
+            return str(bound)
+    return '+Inf'
+
+
+def _aggregate(span, total_ms):
+    with _lock:
+        stats = _stats.setdefault(span.name, {
+            'count': 0,
+            'total_ms': 0.0,
+            'db_ms': 0.0,
+            'queries': 0,
+            'max_ms': 0.0,
+            'max_queries': 0,
+            'histogram': {},
+            'slowest_queries': [],
+        })
+        stats['count'] += 1
+        stats['total_ms'] += total_ms
+        stats['db_ms'] += span.db_ms
+        stats['queries'] += span.queries
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['max_queries'] = max(stats['max_queries'], span.queries)
+        bucket = _bucket(total_ms)
+        stats['histogram'][bucket] = stats['histogram'].get(bucket, 0) + 1
+        stats['slowest_queries'] = heapq.nlargest(
+            SLOWEST_QUERIES, stats['slowest_queries'] + span.slowest
+        )
+
+
+@contextmanager
+def instrument(name):
+    """Records queries and time of the wrapped block under 'name' (if enabled)."""
+    if not is_enabled():
+        yield None
+        return
+
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        spans = _local.spans = []
+
+    span = Span(name)
+    # Only the outermost span hooks into the connection, the hook feeds all active spans
+    wrapper = connection.execute_wrapper(_record_query) if not spans else nullcontext()
+    spans.append(span)
+    start = time.perf_counter()
+    try:
+        with wrapper:
+            yield span
+    finally:
+        spans.remove(span)
+        _aggregate(span, (time.perf_counter() - start) * 1000)
+
+
+def instrumented(name):
+    """Decorator form of instrument()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with instrument(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_stats():
+    """Snapshot of the aggregated numbers, with averages, sorted by total time."""
+    with _lock:
+        snapshot = {name: dict(stats) for name, stats in _stats.items()}
+
+    for stats in snapshot.values():
+        count = stats['count'] or 1
+        stats['avg_ms'] = round(stats['total_ms'] / count, 3)
+        stats['avg_db_ms'] = round(stats['db_ms'] / count, 3)
+        stats['avg_queries'] = round(stats['queries'] / count, 2)
+        stats['slowest_queries'] = [
+            {'ms': round(duration, 3), 'sql': sql} for duration, sql in stats['slowest_queries']
+        ]
+
+    return dict(sorted(snapshot.items(), key=lambda entry: entry[1]['total_ms'], reverse=True))
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,22 @@
+# meinplugin/management/commands/archive_loans.py
+from django.core.management.base import BaseCommand
+
+from meinplugin.tasks import ARCHIVE_CHUNK_SIZE, archive_closed_loans
+
+
+class Command(BaseCommand):
+    """Moves closed loans into the archive tables (same as the scheduled 'archive_closed' task)."""
+
+    help = "Archives RETURNED / CANCELLED loans older than the given number of days"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Minimum age in days (default: ARCHIVE_AFTER_DAYS plugin setting)")
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE,
+                            help="Number of loans archived per transaction")
+
+    def handle(self, *args, **options):
+        result = archive_closed_loans(days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['loans']} loan(s) with {result['items']} item(s) in {result['seconds']}s"
+        ))
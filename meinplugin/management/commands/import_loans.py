@@ -0,0 +1,40 @@
+# meinplugin/management/commands/import_loans.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from meinplugin.importer import IMPORT_CHUNK_SIZE, LoanImporter
+
+
+class Command(BaseCommand):
+    """Imports loans and loaned items from a CSV file (see meinplugin/importer.py for the format)."""
+
+    help = "Imports loans from a CSV file (one row per loaned item)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Path of the CSV file")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate the file without writing anything")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Number of rows written per transaction")
+        parser.add_argument('--user', help="Username to record as creator of the loans")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"User '{options['user']}' not found")
+
+        importer = LoanImporter(user=user, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        with open(options['file'], newline='', encoding='utf-8-sig') as f:
+            importer.run(f)
+
+        for line, message in importer.errors:
+            self.stderr.write(f"Line {line}: {message}")
+
+        prefix = "Dry run: would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {importer.loans_created} loan(s) with {importer.items_created} item(s), "
+            f"{len(importer.errors)} row(s) skipped"
+        ))
@@ -0,0 +1,61 @@
+# meinplugin/management/commands/loan_benchmark.py
+import json
+import platform
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from plugin import registry
+
+from meinplugin import PLUGIN_VERSION
+from meinplugin.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    """Measures latency and query counts of the loan plugin on synthetic data sets."""
+
+    help = "Benchmarks the loan plugin views and operations at several data sizes (all data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000,10000',
+                            help="Comma separated numbers of loaned items to generate")
+        parser.add_argument('--items-per-loan', type=int, default=10)
+        parser.add_argument('--loans-per-customer', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement")
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        plugin = registry.get_plugin('loan')
+        if not plugin:
+            raise CommandError("Loan plugin (slug='loan') not found or not active.")
+
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of numbers")
+
+        results = []
+        for items in sizes:
+            loans = max(3, items // options['items_per_loan'])
+            customers = max(1, loans // options['loans_per_customer'])
+            self.stdout.write(f"Benchmarking {items} items / {loans} loans / {customers} customers ...")
+
+            for result in run_benchmark(plugin, items, loans, customers, repeat=options['repeat']):
+                results.append(result)
+                self.stdout.write(
+                    f"  {result['name']:<24} {result['median_ms']:>10.2f} ms  {result['queries']:>4} queries"
+                )
+
+        report = {
+            'plugin_version': PLUGIN_VERSION,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
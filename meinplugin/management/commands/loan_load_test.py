@@ -0,0 +1,55 @@
+# meinplugin/management/commands/loan_load_test.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from plugin import registry
+
+from meinplugin.benchmark import run_concurrency_test
+
+
+class Command(BaseCommand):
+    """Issues / returns one loan from many parallel scanners and checks the result for consistency."""
+
+    help = "Concurrent issue / return load test (commits synthetic data and deletes it afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scanners', type=int, default=8, help="Number of parallel threads")
+        parser.add_argument('--items', type=int, default=1000, help="Number of items on the test loan")
+        parser.add_argument('--batch-size', type=int, default=10, help="Items per issue / return call")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated data")
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        plugin = registry.get_plugin('loan')
+        if not plugin:
+            raise CommandError("Loan plugin (slug='loan') not found or not active.")
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                "SQLite has no row locks and serializes writers - use PostgreSQL or MySQL for meaningful numbers."
+            ))
+
+        result = run_concurrency_test(
+            plugin, scanners=options['scanners'], items=options['items'],
+            batch_size=options['batch_size'], keep=options['keep'],
+        )
+
+        for phase in ('issue', 'return'):
+            numbers = result[phase]
+            self.stdout.write(
+                f"{phase:<7} {numbers['processed']:>6} items  {numbers['seconds']:>8.2f} s  "
+                f"{numbers['items_per_second']} items/s  {numbers['deadlocks']} deadlock(s)"
+            )
+        for name, passed in result['checks'].items():
+            style = self.style.SUCCESS if passed else self.style.ERROR
+            self.stdout.write(style(f"{name:<20} {'OK' if passed else 'FAILED'}"))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if not all(result['checks'].values()):
+            raise CommandError("Consistency checks failed")
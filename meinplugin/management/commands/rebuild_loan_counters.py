@@ -0,0 +1,51 @@
+# meinplugin/management/commands/rebuild_loan_counters.py
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+from meinplugin.models import ITEM_COUNTER_FIELDS, Loan, LoanedItem
+
+
+class Command(BaseCommand):
+    """Recalculates the denormalized item counters (items_pending etc.) of all loans."""
+
+    help = "Rebuilds the per-status item counters of all loans from the LoanedItem table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help="Number of loans updated per transaction")
+        parser.add_argument('--sync-status', action='store_true',
+                            help="Also re-derive the loan status from the rebuilt counters")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        def item_count(status):
+            # Correlated subquery: number of items of the outer loan with this status
+            count = (
+                LoanedItem.objects.filter(loan=models.OuterRef('pk'), status=status)
+                .order_by().values('loan').annotate(n=models.Count('pk')).values('n')
+            )
+            return Coalesce(models.Subquery(count), 0, output_field=models.IntegerField())
+
+        counters = {field: item_count(status) for status, field in ITEM_COUNTER_FIELDS.items()}
+
+        last_pk = 0
+        total = 0
+        while True:
+            pks = list(
+                Loan.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+
+            with transaction.atomic():
+                Loan.objects.filter(pk__in=pks).update(**counters)
+                if options['sync_status']:
+                    for pk in pks:
+                        Loan.sync_status(pk)
+
+            total += len(pks)
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt item counters for {total} loan(s)"))
@@ -0,0 +1,18 @@
+# meinplugin/management/commands/rebuild_loan_summary.py
+from django.core.management.base import BaseCommand
+
+from meinplugin.models import CustomerLoanSummary
+
+
+class Command(BaseCommand):
+    """Recalculates the per-customer loan summaries (CustomerLoanSummary) from the loan table."""
+
+    help = "Rebuilds the per-customer loan summary table from the open loans"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, action='append', dest='customers',
+                            help="Only rebuild this customer (Company pk), can be repeated")
+
+    def handle(self, *args, **options):
+        written = CustomerLoanSummary.rebuild(options['customers'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt loan summary for {written} customer(s)"))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('stock', '__first__'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('company', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_date', models.DateTimeField(auto_now_add=True, verbose_name='Loan Date')),
+                ('due_date', models.DateField(verbose_name='Due Date')),
+                ('return_date', models.DateField(blank=True, null=True, verbose_name='Actual Return Date')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ACTIVE', 'Active'), ('OVERDUE', 'Overdue'), ('RETURNED', 'Returned'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20, verbose_name='Status')),
+                ('reference', models.CharField(blank=True, help_text='Optional reference for this loan', max_length=100, verbose_name='Reference / Order ID')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True, verbose_name='Last Updated')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans_created', to=settings.AUTH_USER_MODEL, verbose_name='Created By')),
+                ('customer', models.ForeignKey(limit_choices_to={'is_customer': True}, on_delete=django.db.models.deletion.PROTECT, related_name='loans_received', to='company.company', verbose_name='Customer')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LoanedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Issue'), ('ON_LOAN', 'On Loan'), ('RETURNED', 'Returned')], default='PENDING', max_length=20, verbose_name='Item Status')),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='meinplugin.loan', verbose_name='Loan')),
+                ('stock_item', models.ForeignKey(limit_choices_to={'serialized': True}, on_delete=django.db.models.deletion.PROTECT, related_name='loan_records', to='stock.stockitem', verbose_name='Stock Item')),
+            ],
+            options={
+                'verbose_name': 'Loaned Item',
+                'verbose_name_plural': 'Loaned Items',
+            },
+        ),
+    ]
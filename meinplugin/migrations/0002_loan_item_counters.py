@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def populate_item_counters(apps, schema_editor):
+    """Fills the new counters from the existing LoanedItems (see rebuild_loan_counters)."""
+    Loan = apps.get_model('meinplugin', 'Loan')
+    LoanedItem = apps.get_model('meinplugin', 'LoanedItem')
+
+    def item_count(status):
+        count = (
+            LoanedItem.objects.filter(loan=models.OuterRef('pk'), status=status)
+            .order_by().values('loan').annotate(n=models.Count('pk')).values('n')
+        )
+        return Coalesce(models.Subquery(count), 0, output_field=models.IntegerField())
+
+    Loan.objects.update(
+        items_pending=item_count('PENDING'),
+        items_on_loan=item_count('ON_LOAN'),
+        items_returned=item_count('RETURNED'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meinplugin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='items_on_loan',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Items On Loan'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='items_pending',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Pending Items'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='items_returned',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Returned Items'),
+        ),
+        migrations.RunPython(populate_item_counters, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meinplugin', '0002_loan_item_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['loan_date', 'id'], name='loan_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'loan_date', 'id'], name='loan_status_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['customer', 'loan_date', 'id'], name='loan_customer_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['due_date'], name='loan_due_date_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meinplugin', '0003_loan_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'due_date'], name='loan_status_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loaneditem',
+            index=models.Index(fields=['loan', 'status'], name='loaned_item_loan_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loaneditem',
+            index=models.Index(fields=['stock_item', 'status'], name='loaned_item_stock_status_idx'),
+        ),
+        # Fails if a StockItem is already on two open loans - clean those up first
+        migrations.AddConstraint(
+            model_name='loaneditem',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'RETURNED'), _negated=True), fields=('stock_item',), name='loaned_item_one_active_loan'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '__first__'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('meinplugin', '0004_loaneditem_one_active_loan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('ISSUE', 'Issue'), ('RETURN', 'Return')], max_length=10, verbose_name='Action')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10, verbose_name='Status')),
+                ('item_pks', models.JSONField(default=list, verbose_name='Items')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total Items')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed Items')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated')),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='meinplugin.loan', verbose_name='Loan')),
+                ('return_location', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='stock.stocklocation', verbose_name='Return Location')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Loan Job',
+                'verbose_name_plural': 'Loan Jobs',
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='loan_job_status_updated_idx')],
+            },
+        ),
+    ]
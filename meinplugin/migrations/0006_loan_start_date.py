@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+import datetime
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def populate_start_date(apps, schema_editor):
+    """Existing loans started on the day they were created."""
+    Loan = apps.get_model('meinplugin', 'Loan')
+    Loan.objects.update(start_date=TruncDate('loan_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meinplugin', '0005_loanjob'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='loaneditem',
+            name='loaned_item_one_active_loan',
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='start_date',
+            field=models.DateField(default=datetime.date.today, help_text='First day of the loan (a future date reserves the items)', verbose_name='Start Date'),
+        ),
+        migrations.RunPython(populate_start_date, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['start_date', 'due_date'], name='loan_start_due_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='loaneditem',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'ON_LOAN')), fields=('stock_item',), name='loaned_item_one_active_loan'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Loan status -> summary counter, closed loans aren't counted (see LOAN_COUNTER_FIELDS)
+LOAN_COUNTER_FIELDS = {
+    'PENDING': 'pending_loans',
+    'ACTIVE': 'active_loans',
+    'OVERDUE': 'overdue_loans',
+}
+
+
+def build_summaries(apps, schema_editor):
+    """Fills the summary table from the open loans (see CustomerLoanSummary.rebuild)."""
+    Loan = apps.get_model('meinplugin', 'Loan')
+    CustomerLoanSummary = apps.get_model('meinplugin', 'CustomerLoanSummary')
+
+    aggregates = {
+        field: models.Count('pk', filter=models.Q(status=status))
+        for status, field in LOAN_COUNTER_FIELDS.items()
+    }
+    aggregates['items_pending'] = models.Sum('items_pending')
+    aggregates['items_on_loan'] = models.Sum('items_on_loan')
+
+    rows = (
+        Loan.objects.filter(status__in=list(LOAN_COUNTER_FIELDS)).order_by()
+        .values('customer_id').annotate(**aggregates)
+    )
+    CustomerLoanSummary.objects.bulk_create(
+        [CustomerLoanSummary(customer_id=row.pop('customer_id'), **row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '__first__'),
+        ('meinplugin', '0006_loan_start_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerLoanSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_summary', serialize=False, to='company.company', verbose_name='Customer')),
+                ('pending_loans', models.IntegerField(default=0, verbose_name='Pending Loans')),
+                ('active_loans', models.IntegerField(default=0, verbose_name='Active Loans')),
+                ('overdue_loans', models.IntegerField(default=0, verbose_name='Overdue Loans')),
+                ('items_pending', models.IntegerField(default=0, verbose_name='Pending Items')),
+                ('items_on_loan', models.IntegerField(default=0, verbose_name='Items On Loan')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last Updated')),
+            ],
+            options={
+                'verbose_name': 'Customer Loan Summary',
+                'verbose_name_plural': 'Customer Loan Summaries',
+                'ordering': ['-overdue_loans', '-active_loans', '-pending_loans', 'customer_id'],
+            },
+        ),
+        migrations.RunPython(build_summaries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('stock', '__first__'),
+        ('company', '__first__'),
+        ('meinplugin', '0007_customerloansummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLoan',
+            fields=[
+                ('id', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Loan ID')),
+                ('customer_name', models.CharField(blank=True, max_length=250, verbose_name='Customer')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Reference')),
+                ('notes', models.TextField(blank=True, verbose_name='Notes')),
+                ('loan_date', models.DateTimeField(verbose_name='Loan Date')),
+                ('start_date', models.DateField(verbose_name='Start Date')),
+                ('due_date', models.DateField(verbose_name='Due Date')),
+                ('return_date', models.DateField(blank=True, null=True, verbose_name='Return Date')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ACTIVE', 'Active'), ('OVERDUE', 'Overdue'), ('RETURNED', 'Returned'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Status')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived')),
+            ],
+            options={
+                'verbose_name': 'Archived Loan',
+                'verbose_name_plural': 'Archived Loans',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedLoanItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serial', models.CharField(blank=True, max_length=100, verbose_name='Serial Number')),
+                ('part_name', models.CharField(blank=True, max_length=250, verbose_name='Part')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Issue'), ('ON_LOAN', 'On Loan'), ('RETURNED', 'Returned')], max_length=20, verbose_name='Item Status')),
+            ],
+            options={
+                'verbose_name': 'Archived Loan Item',
+                'verbose_name_plural': 'Archived Loan Items',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='loan',
+            name='loan_status_due_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'ACTIVE', 'OVERDUE'])), fields=['status', 'due_date'], name='loan_open_due_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedloanitem',
+            name='archived_loan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='meinplugin.archivedloan', verbose_name='Archived Loan'),
+        ),
+        migrations.AddField(
+            model_name='archivedloanitem',
+            name='stock_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='stock.stockitem', verbose_name='Stock Item'),
+        ),
+        migrations.AddField(
+            model_name='archivedloan',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Created By'),
+        ),
+        migrations.AddField(
+            model_name='archivedloan',
+            name='customer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='company.company', verbose_name='Customer'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedloanitem',
+            index=models.Index(fields=['serial'], name='archived_item_serial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedloanitem',
+            index=models.Index(fields=['stock_item'], name='archived_item_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedloan',
+            index=models.Index(fields=['loan_date', 'id'], name='archived_loan_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedloan',
+            index=models.Index(fields=['customer', 'loan_date', 'id'], name='archived_loan_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedloan',
+            index=models.Index(fields=['reference'], name='archived_loan_reference_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('meinplugin', '0008_loan_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, verbose_name='Key')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status Code')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Response')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'indexes': [models.Index(fields=['created_at'], name='idempotency_key_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotency_key_unique_per_user'),
+        ),
+    ]
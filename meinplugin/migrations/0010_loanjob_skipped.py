@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meinplugin', '0009_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanjob',
+            name='skipped',
+            field=models.PositiveIntegerField(default=0, verbose_name='Skipped Items'),
+        ),
+    ]
@@ -1,14 +1,15 @@
 # meinplugin/models.py
-from django.db import models
+from datetime import date
+
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from django.conf import settings # To potentially get the User model if needed (but prefer InvenTreeUser)
+from django.conf import settings # User FKs point to AUTH_USER_MODEL, so migrations stay swappable
 
 # InvenTree models needed for ForeignKeys
 from company.models import Company
-from stock.models import StockItem
-# Use InvenTree's custom user model proxy for consistency
-from InvenTree.models import InvenTreeUser
+from stock.models import StockItem, StockLocation
 
 
 class Loan(models.Model):
@@ -24,6 +25,9 @@ class Loan(models.Model):
         RETURNED = 'RETURNED', _('Returned')     # All items returned
         CANCELLED = 'CANCELLED', _('Cancelled')   # Loan cancelled before activation
 
+    # Statuses in which items can still be added, issued and returned
+    OPEN_STATUSES = [LoanStatus.PENDING, LoanStatus.ACTIVE, LoanStatus.OVERDUE]
+
     # Customer receiving the loan (links to InvenTree's Company model)
     customer = models.ForeignKey(
         Company,
@@ -44,6 +48,13 @@ class Loan(models.Model):
         verbose_name=_('Due Date')
     )
 
+    # First day of the loan - a date in the future makes the loan a reservation
+    start_date = models.DateField(
+        default=date.today,
+        verbose_name=_('Start Date'),
+        help_text=_('First day of the loan (a future date reserves the items)')
+    )
+
     # Actual date when all items of the loan were returned
     return_date = models.DateField(
         null=True, blank=True, # Null until fully returned
@@ -73,7 +84,7 @@ class Loan(models.Model):
 
     # User who created the loan record in InvenTree
     created_by = models.ForeignKey(
-       InvenTreeUser,
+       settings.AUTH_USER_MODEL,
        on_delete=models.SET_NULL, # Keep loan record if user is deleted
        null=True, blank=True,
        related_name='loans_created', # How to access loans created by a user
@@ -87,29 +98,213 @@ class Loan(models.Model):
         verbose_name=_('Last Updated')
     )
 
+    # Denormalized number of items per LoanedItem status.
+    # Kept up to date by LoanedItem.save() / delete and the plugin's batch operations,
+    # rebuilt by the 'rebuild_loan_counters' management command.
+    items_pending = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name=_('Pending Items')
+    )
+    items_on_loan = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name=_('Items On Loan')
+    )
+    items_returned = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name=_('Returned Items')
+    )
+
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the loan list: ORDER BY loan_date DESC, id DESC
+            models.Index(fields=['loan_date', 'id'], name='loan_date_id_idx'),
+            # Same ordering, pre-filtered by status or customer
+            models.Index(fields=['status', 'loan_date', 'id'], name='loan_status_date_id_idx'),
+            models.Index(fields=['customer', 'loan_date', 'id'], name='loan_customer_date_id_idx'),
+            # Due date range filters
+            models.Index(fields=['due_date'], name='loan_due_date_idx'),
+            # Open loans by due date (overdue checks). Partial: closed loans never need it
+            models.Index(
+                fields=['status', 'due_date'], name='loan_open_due_date_idx',
+                condition=models.Q(status__in=['PENDING', 'ACTIVE', 'OVERDUE']),
+            ),
+            # Interval overlap checks for reservations / availability
+            models.Index(fields=['start_date', 'due_date'], name='loan_start_due_date_idx'),
+        ]
 
     def __str__(self):
         """String representation of the Loan model."""
         return _("Loan {pk} to {customer}").format(pk=self.pk, customer=self.customer.name)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers the stored customer and status, for the customer summary (see signals.py)."""
+        instance = super().from_db(db, field_names, values)
+        instance._stored_customer_id = instance.__dict__.get('customer_id')
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
+
     def get_absolute_url(self):
         """Returns the URL to view the detail page for this loan."""
         # Assumes a URL named 'loan_detail' exists within the 'loan' namespace (plugin slug)
         return reverse('plugin:loan:loan_detail', kwargs={'pk': self.pk})
 
+    @classmethod
+    def apply_item_deltas(cls, loan_pk, deltas):
+        """
+        Adjusts the item counters of a loan, e.g. {'PENDING': -2, 'ON_LOAN': 2}.
+
+        Runs as a single UPDATE with F-expressions, so concurrent changes can't overwrite
+        each other and nothing has to be read first.
+        """
+        updates = {
+            ITEM_COUNTER_FIELDS[status]: models.F(ITEM_COUNTER_FIELDS[status]) + delta
+            for status, delta in deltas.items() if delta
+        }
+        if updates:
+            updates['updated_at'] = timezone.now()
+            cls.objects.filter(pk=loan_pk).update(**updates)
+            CustomerLoanSummary.apply_item_deltas(loan_pk, deltas)
+            # Bulk paths don't send signals - invalidate the cached fragments here
+            from .caching import bump_loan_cache_version
+            bump_loan_cache_version(loan_pk)
+
+    @classmethod
+    def sync_status(cls, loan_pk):
+        """
+        Derives the loan status from the item counters (no LoanedItems are loaded).
+
+        - all items returned -> RETURNED (and return_date is set)
+        - first item issued  -> ACTIVE
+        Closed loans (RETURNED / CANCELLED) are never re-opened automatically.
+        """
+        from datetime import date
+
+        with transaction.atomic():
+            # Lock the row, so the old status for the customer summary is the one we replace
+            loan = (
+                cls.objects.select_for_update().filter(pk=loan_pk)
+                .exclude(status__in=[cls.LoanStatus.RETURNED, cls.LoanStatus.CANCELLED])
+                .values('status', 'customer_id', 'items_pending', 'items_on_loan', 'items_returned')
+                .first()
+            )
+            if loan is None:
+                return
+
+            if loan['items_pending'] == 0 and loan['items_on_loan'] == 0 and loan['items_returned'] > 0:
+                # All items are back
+                new_status, extra = cls.LoanStatus.RETURNED, {'return_date': date.today()}
+            elif loan['status'] == cls.LoanStatus.PENDING and loan['items_on_loan'] > 0:
+                # At least one item has left the building
+                new_status, extra = cls.LoanStatus.ACTIVE, {}
+            else:
+                return
+
+            cls.objects.filter(pk=loan_pk).update(status=new_status, updated_at=timezone.now(), **extra)
+            CustomerLoanSummary.apply_status_change(loan['customer_id'], {loan['status']: -1, new_status: 1})
+
+        from .caching import bump_loan_cache_version
+        bump_loan_cache_version(loan_pk)
+
+    @property
+    def items_total(self):
+        """Total number of items on this loan (from the counters)."""
+        return self.items_pending + self.items_on_loan + self.items_returned
+
+    @classmethod
+    def overdue_expression(cls):
+        """SQL counterpart of is_overdue, for use in annotate()."""
+        from datetime import date
+        return models.Case(
+            models.When(status=cls.LoanStatus.OVERDUE, then=models.Value(True)),
+            models.When(status=cls.LoanStatus.ACTIVE, due_date__lt=date.today(), then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        )
+
+    @property
+    def is_open(self):
+        """True until the loan is RETURNED or CANCELLED (a partly issued loan is already ACTIVE)."""
+        return self.status in self.OPEN_STATUSES
+
     @property
     def is_overdue(self):
         """Checks if the loan is currently active and past its due date."""
         from datetime import date
-        # A loan is overdue if it's ACTIVE and the due date is in the past
+        # Set by the scheduled overdue sweep (meinplugin.tasks.update_overdue_loans)
+        if self.status == self.LoanStatus.OVERDUE:
+            return True
+        # A loan is overdue if it's ACTIVE and the due date is in the past (sweep not run yet)
         return self.status == self.LoanStatus.ACTIVE and self.due_date < date.today()
 
 
+class LoanedItemQuerySet(models.QuerySet):
+    """QuerySet for LoanedItem with the "is this StockItem lent out?" lookups."""
+
+    def active(self):
+        """Records which are not RETURNED yet (covered by the (stock_item, status) index)."""
+        return self.filter(status__in=LoanedItem.ACTIVE_STATUSES)
+
+    def overlapping(self, start, end):
+        """
+        Records which block their StockItem somewhere between 'start' and 'end' (dates).
+
+        A record blocks its item from the loan's start_date to its due_date, items which
+        are ON_LOAN (possibly overdue) stay blocked until they are returned.
+        Records of cancelled loans don't block anything.
+        """
+        return self.active().exclude(loan__status=Loan.LoanStatus.CANCELLED).filter(
+            models.Q(loan__due_date__gte=start) | models.Q(status=LoanedItem.ItemStatus.ON_LOAN),
+            loan__start_date__lte=end,
+        )
+
+    def busy_stock_items(self, stock_items, start, end):
+        """
+        Maps StockItem pk -> Loan pk for every given StockItem which is booked
+        between 'start' and 'end'. One query for any number of StockItems.
+        """
+        stock_item_pks = {getattr(item, 'pk', item) for item in stock_items}
+        if not stock_item_pks:
+            return {}
+        return dict(
+            self.overlapping(start, end).filter(stock_item_id__in=stock_item_pks)
+            .values_list('stock_item_id', 'loan_id')
+        )
+
+    def on_loan(self):
+        """Records whose StockItem is physically out (at most one per StockItem)."""
+        return self.filter(status=LoanedItem.ItemStatus.ON_LOAN)
+
+    def is_on_loan(self, stock_item):
+        """True if the StockItem (instance or pk) is currently issued on a loan."""
+        stock_item_pk = getattr(stock_item, 'pk', stock_item)
+        return self.on_loan().filter(stock_item_id=stock_item_pk).exists()
+
+    def active_loan_for(self, stock_items):
+        """
+        Maps StockItem pk -> Loan pk for every given StockItem which is currently issued.
+
+        Answers for any number of StockItems (instances or pks) with one indexed query;
+        items which are not lent out - including ones only reserved by a PENDING record -
+        are missing from the result.
+        """
+        stock_item_pks = {getattr(item, 'pk', item) for item in stock_items}
+        if not stock_item_pks:
+            return {}
+        return dict(
+            self.on_loan().filter(stock_item_id__in=stock_item_pks)
+            .values_list('stock_item_id', 'loan_id')
+        )
+
+
 class LoanedItem(models.Model):
     """
     Represents an individual StockItem that is part of a specific Loan.
     """
 
+    objects = LoanedItemQuerySet.as_manager()
+
     class ItemStatus(models.TextChoices):
         """Defines the status of a specific item within a loan."""
         PENDING = 'PENDING', _('Pending Issue') # Item added to loan, not yet physically moved
@@ -117,6 +312,9 @@ class LoanedItem(models.Model):
         RETURNED = 'RETURNED', _('Returned')    # Item physically returned from loan location
         # Could add more statuses like 'LOST', 'DAMAGED' if needed
 
+    # Statuses in which the StockItem is still bound to the loan
+    ACTIVE_STATUSES = [ItemStatus.PENDING, ItemStatus.ON_LOAN]
+
     # Link back to the parent Loan transaction
     loan = models.ForeignKey(
         Loan,
@@ -147,6 +345,50 @@ class LoanedItem(models.Model):
         verbose_name=_('Item Status')
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remembers the stored loan and status, so save() can update the Loan counters."""
+        instance = super().from_db(db, field_names, values)
+        instance._stored_loan_id = instance.__dict__.get('loan_id')
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the item and keeps the item counters of the Loan(s) in sync."""
+        created = self._state.adding
+        old_loan_id = getattr(self, '_stored_loan_id', None)
+        old_status = getattr(self, '_stored_status', None)
+
+        with transaction.atomic():
+            if not created and (old_loan_id is None or old_status is None):
+                # Stored values unknown (deferred field or instance not loaded from the db)
+                stored = (
+                    LoanedItem.objects.select_for_update().filter(pk=self.pk)
+                    .values_list('loan_id', 'status').first()
+                )
+                if stored is None:
+                    # Saved with an explicit pk which doesn't exist yet - an INSERT
+                    created = True
+                else:
+                    old_loan_id, old_status = stored
+
+            super().save(*args, **kwargs)
+
+            if created:
+                Loan.apply_item_deltas(self.loan_id, {self.status: 1})
+                Loan.sync_status(self.loan_id)
+            elif old_loan_id != self.loan_id:
+                Loan.apply_item_deltas(old_loan_id, {old_status: -1})
+                Loan.apply_item_deltas(self.loan_id, {self.status: 1})
+                Loan.sync_status(old_loan_id)
+                Loan.sync_status(self.loan_id)
+            elif old_status != self.status:
+                Loan.apply_item_deltas(self.loan_id, {old_status: -1, self.status: 1})
+                Loan.sync_status(self.loan_id)
+
+        self._stored_loan_id = self.loan_id
+        self._stored_status = self.status
+
     # Optional: Could add fields for condition tracking if needed
     # condition_notes_out = models.TextField(blank=True, verbose_name=_('Condition Notes (Out)'))
     # condition_notes_returned = models.TextField(blank=True, verbose_name=_('Condition Notes (Returned)'))
@@ -154,14 +396,410 @@ class LoanedItem(models.Model):
 
     def __str__(self):
         """String representation of the LoanedItem model."""
-        return _("{item} on Loan {loan_pk}").format(item=self.stock_item, loan_pk=self.loan.pk)
+        return _("{item} on Loan {loan_pk}").format(item=self.stock_item, loan_pk=self.loan_id)
 
     # Ensure that a specific StockItem is only actively on loan once at a time
     class Meta:
-        unique_together = [
-            # A StockItem can only be linked once to a Loan that is NOT returned/cancelled
-            # Note: This constraint might need adjustment depending on exact workflow for PENDING items
-            # ('stock_item', 'loan'), # Basic uniqueness if needed, but status matters more
+        constraints = [
+            # A StockItem can only physically be on one loan at a time. PENDING records of
+            # later loans (reservations) may exist next to it - their date ranges are
+            # checked against each other with LoanedItem.objects.overlapping()
+            models.UniqueConstraint(
+                fields=['stock_item'],
+                condition=models.Q(status='ON_LOAN'),
+                name='loaned_item_one_active_loan',
+            ),
+        ]
+        indexes = [
+            # Items of a loan by status (detail page, batch issue/return)
+            models.Index(fields=['loan', 'status'], name='loaned_item_loan_status_idx'),
+            # "Is this StockItem lent out?" (is_on_loan / active_loan_for)
+            models.Index(fields=['stock_item', 'status'], name='loaned_item_stock_status_idx'),
         ]
         verbose_name = _('Loaned Item')
-        verbose_name_plural = _('Loaned Items')
\ No newline at end of file
+        verbose_name_plural = _('Loaned Items')
+
+
+# Maps a LoanedItem status to the matching counter field on Loan
+ITEM_COUNTER_FIELDS = {
+    LoanedItem.ItemStatus.PENDING: 'items_pending',
+    LoanedItem.ItemStatus.ON_LOAN: 'items_on_loan',
+    LoanedItem.ItemStatus.RETURNED: 'items_returned',
+}
+
+
+# Loan counters of CustomerLoanSummary per Loan status - closed loans aren't counted
+LOAN_COUNTER_FIELDS = {
+    Loan.LoanStatus.PENDING: 'pending_loans',
+    Loan.LoanStatus.ACTIVE: 'active_loans',
+    Loan.LoanStatus.OVERDUE: 'overdue_loans',
+}
+
+# Item counters of open loans which are summed up per customer
+SUMMARY_ITEM_FIELDS = ('items_pending', 'items_on_loan')
+
+
+class CustomerLoanSummary(models.Model):
+    """
+    Open loans and items per customer, so dashboards don't aggregate the loan tables.
+
+    Updated incrementally with F-expressions wherever a loan's status, customer or item
+    counters change; rebuilt by the 'rebuild_loan_summary' management command.
+    OVERDUE is the stored status, i.e. as current as the last overdue sweep.
+    """
+
+    customer = models.OneToOneField(
+        Company,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='loan_summary',
+        verbose_name=_('Customer')
+    )
+
+    # Plain IntegerFields - a counter that drifted below zero must not break a status change
+    pending_loans = models.IntegerField(default=0, verbose_name=_('Pending Loans'))
+    active_loans = models.IntegerField(default=0, verbose_name=_('Active Loans'))
+    overdue_loans = models.IntegerField(default=0, verbose_name=_('Overdue Loans'))
+    items_pending = models.IntegerField(default=0, verbose_name=_('Pending Items'))
+    items_on_loan = models.IntegerField(default=0, verbose_name=_('Items On Loan'))
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Last Updated'))
+
+    class Meta:
+        # Most overdue / active customers first
+        ordering = ['-overdue_loans', '-active_loans', '-pending_loans', 'customer_id']
+        verbose_name = _('Customer Loan Summary')
+        verbose_name_plural = _('Customer Loan Summaries')
+
+    def __str__(self):
+        return _("Loan summary of {customer}").format(customer=self.customer_id)
+
+    @classmethod
+    def apply_deltas(cls, customer_pk, deltas):
+        """
+        Adjusts the counters of a customer, e.g. {'active_loans': 1, 'items_on_loan': 3}.
+
+        A customer without a summary row is rebuilt from the loan table instead - callers
+        run after their change is written, so the rebuild already contains it.
+        """
+        updates = {field: models.F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates or not customer_pk:
+            return
+        updates['updated_at'] = timezone.now()
+        if not cls.objects.filter(customer_id=customer_pk).update(**updates):
+            cls.rebuild([customer_pk])
+
+    @classmethod
+    def apply_status_change(cls, customer_pk, status_deltas):
+        """Adjusts the loan counters, e.g. {'PENDING': -1, 'ACTIVE': 1}. Closed statuses are ignored."""
+        deltas = {}
+        for status, delta in status_deltas.items():
+            if status in LOAN_COUNTER_FIELDS:
+                field = LOAN_COUNTER_FIELDS[status]
+                deltas[field] = deltas.get(field, 0) + delta
+        cls.apply_deltas(customer_pk, deltas)
+
+    @classmethod
+    def apply_item_deltas(cls, loan_pk, item_deltas):
+        """
+        Mirrors Loan.apply_item_deltas() for the loan's customer, if the loan is open.
+
+        One UPDATE, the customer is found through a subquery on the loan.
+        """
+        updates = {
+            ITEM_COUNTER_FIELDS[status]: models.F(ITEM_COUNTER_FIELDS[status]) + delta
+            for status, delta in item_deltas.items()
+            if delta and ITEM_COUNTER_FIELDS[status] in SUMMARY_ITEM_FIELDS
+        }
+        if updates:
+            updates['updated_at'] = timezone.now()
+            cls.objects.filter(
+                customer__loans_received__pk=loan_pk,
+                customer__loans_received__status__in=list(LOAN_COUNTER_FIELDS),
+            ).update(**updates)
+
+    @staticmethod
+    def loan_contribution(status, items_pending, items_on_loan):
+        """Counter values one loan adds to its customer's summary."""
+        if status not in LOAN_COUNTER_FIELDS:
+            return {}
+        return {LOAN_COUNTER_FIELDS[status]: 1, 'items_pending': items_pending, 'items_on_loan': items_on_loan}
+
+    @classmethod
+    def apply_loan_change(cls, loan, old_customer_pk, old_status):
+        """Moves a saved loan's contribution from its stored customer / status to the new ones."""
+        old = cls.loan_contribution(old_status, loan.items_pending, loan.items_on_loan) if old_customer_pk else {}
+        new = cls.loan_contribution(loan.status, loan.items_pending, loan.items_on_loan)
+
+        if old_customer_pk == loan.customer_id:
+            cls.apply_deltas(loan.customer_id, {
+                field: new.get(field, 0) - old.get(field, 0) for field in old.keys() | new.keys()
+            })
+        else:
+            cls.apply_deltas(old_customer_pk, {field: -value for field, value in old.items()})
+            cls.apply_deltas(loan.customer_id, new)
+
+    @classmethod
+    def rebuild(cls, customer_pks=None):
+        """
+        Recalculates the summaries from the open loans (all customers or the given ones).
+
+        One aggregate query over the open loans. Returns the number of summary rows written.
+        """
+        open_loans = Loan.objects.filter(status__in=list(LOAN_COUNTER_FIELDS)).order_by()
+        if customer_pks is not None:
+            customer_pks = set(customer_pks)
+            open_loans = open_loans.filter(customer_id__in=customer_pks)
+
+        aggregates = {
+            field: models.Count('pk', filter=models.Q(status=status))
+            for status, field in LOAN_COUNTER_FIELDS.items()
+        }
+        aggregates.update({field: models.Sum(field) for field in SUMMARY_ITEM_FIELDS})
+
+        totals = {
+            row.pop('customer_id'): row
+            for row in open_loans.values('customer_id').annotate(**aggregates)
+        }
+
+        with transaction.atomic():
+            if customer_pks is None:
+                cls.objects.all().delete()
+                cls.objects.bulk_create(
+                    [cls(customer_id=pk, **values) for pk, values in totals.items()], batch_size=1000
+                )
+                return len(totals)
+
+            empty = dict.fromkeys([*LOAN_COUNTER_FIELDS.values(), *SUMMARY_ITEM_FIELDS], 0)
+            for pk in customer_pks:
+                cls.objects.update_or_create(customer_id=pk, defaults=totals.get(pk, empty))
+            return len(customer_pks)
+
+    @classmethod
+    def with_open_loans(cls):
+        """Summaries of customers with open loans (in Meta.ordering)."""
+        return cls.objects.filter(
+            models.Q(pending_loans__gt=0) | models.Q(active_loans__gt=0) | models.Q(overdue_loans__gt=0)
+        ).select_related('customer')
+
+    @classmethod
+    def totals(cls):
+        """Sums of all customer summaries (one aggregate over O(customers) rows)."""
+        fields = [*LOAN_COUNTER_FIELDS.values(), *SUMMARY_ITEM_FIELDS]
+        totals = cls.objects.aggregate(**{field: models.Sum(field) for field in fields})
+        return {field: value or 0 for field, value in totals.items()}
+
+
+class LoanJob(models.Model):
+    """
+    A large issue / return operation, processed in chunks by the background worker.
+
+    Each chunk commits on its own. The job only stores which items it covers - items which
+    are no longer in the source status are done, so a job can be resumed after a crash.
+    """
+
+    class Action(models.TextChoices):
+        ISSUE = 'ISSUE', _('Issue')
+        RETURN = 'RETURN', _('Return')
+
+    class JobStatus(models.TextChoices):
+        QUEUED = 'QUEUED', _('Queued')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        FAILED = 'FAILED', _('Failed')
+
+    loan = models.ForeignKey(
+        Loan,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name=_('Loan')
+    )
+
+    action = models.CharField(
+        max_length=10,
+        choices=Action.choices,
+        verbose_name=_('Action')
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED,
+        verbose_name=_('Status')
+    )
+
+    # PKs of the LoanedItems covered by this job
+    item_pks = models.JSONField(
+        default=list,
+        verbose_name=_('Items')
+    )
+
+    # Only used for RETURN jobs
+    return_location = models.ForeignKey(
+        StockLocation,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name=_('Return Location')
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name=_('User')
+    )
+
+    total = models.PositiveIntegerField(default=0, verbose_name=_('Total Items'))
+    processed = models.PositiveIntegerField(default=0, verbose_name=_('Processed Items'))
+    # Items which were not in the source status or are still out on another loan
+    skipped = models.PositiveIntegerField(default=0, verbose_name=_('Skipped Items'))
+
+    error = models.TextField(blank=True, verbose_name=_('Error'))
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Last Updated'))
+
+    class Meta:
+        indexes = [
+            # Open jobs of a loan (detail page) and stale jobs (resume task)
+            models.Index(fields=['status', 'updated_at'], name='loan_job_status_updated_idx'),
+        ]
+        verbose_name = _('Loan Job')
+        verbose_name_plural = _('Loan Jobs')
+
+    def __str__(self):
+        return _("{action} job for Loan {loan_pk}").format(action=self.get_action_display(), loan_pk=self.loan_id)
+
+    @property
+    def is_open(self):
+        return self.status in (self.JobStatus.QUEUED, self.JobStatus.RUNNING)
+
+
+class ArchivedLoan(models.Model):
+    """
+    A closed (RETURNED / CANCELLED) loan moved out of the Loan table by the archive task.
+
+    The primary key is the former Loan pk, so loan numbers stay the same. Customer and
+    item details are copied as text, the archive never blocks deleting a Company or StockItem.
+    """
+
+    id = models.PositiveIntegerField(primary_key=True, verbose_name=_('Loan ID'))
+
+    customer = models.ForeignKey(
+        Company,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name=_('Customer')
+    )
+    customer_name = models.CharField(max_length=250, blank=True, verbose_name=_('Customer'))
+
+    reference = models.CharField(max_length=100, blank=True, verbose_name=_('Reference'))
+    notes = models.TextField(blank=True, verbose_name=_('Notes'))
+
+    loan_date = models.DateTimeField(verbose_name=_('Loan Date'))
+    start_date = models.DateField(verbose_name=_('Start Date'))
+    due_date = models.DateField(verbose_name=_('Due Date'))
+    return_date = models.DateField(null=True, blank=True, verbose_name=_('Return Date'))
+    status = models.CharField(max_length=20, choices=Loan.LoanStatus.choices, verbose_name=_('Status'))
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name=_('Created By')
+    )
+
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Archived'))
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the archive list (newest first)
+            models.Index(fields=['loan_date', 'id'], name='archived_loan_date_id_idx'),
+            # Search by customer / reference
+            models.Index(fields=['customer', 'loan_date', 'id'], name='archived_loan_customer_idx'),
+            models.Index(fields=['reference'], name='archived_loan_reference_idx'),
+        ]
+        verbose_name = _('Archived Loan')
+        verbose_name_plural = _('Archived Loans')
+
+    def __str__(self):
+        return _("Archived Loan {pk} to {customer}").format(pk=self.pk, customer=self.customer_name)
+
+    def get_absolute_url(self):
+        return reverse('plugin:loan:loan_archive_detail', kwargs={'pk': self.pk})
+
+
+class ArchivedLoanItem(models.Model):
+    """An item of an ArchivedLoan, with the serial number and part name at archive time."""
+
+    archived_loan = models.ForeignKey(
+        ArchivedLoan,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name=_('Archived Loan')
+    )
+
+    stock_item = models.ForeignKey(
+        StockItem,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='+',
+        verbose_name=_('Stock Item')
+    )
+    serial = models.CharField(max_length=100, blank=True, verbose_name=_('Serial Number'))
+    part_name = models.CharField(max_length=250, blank=True, verbose_name=_('Part'))
+
+    status = models.CharField(max_length=20, choices=LoanedItem.ItemStatus.choices, verbose_name=_('Item Status'))
+
+    class Meta:
+        indexes = [
+            # "Who had serial X?" searches
+            models.Index(fields=['serial'], name='archived_item_serial_idx'),
+            models.Index(fields=['stock_item'], name='archived_item_stock_idx'),
+        ]
+        verbose_name = _('Archived Loan Item')
+        verbose_name_plural = _('Archived Loan Items')
+
+    def __str__(self):
+        return _("{serial} on archived Loan {loan_pk}").format(serial=self.serial, loan_pk=self.archived_loan_id)
+
+
+class IdempotencyKey(models.Model):
+    """
+    A POST which was already processed, identified by a client-chosen key (per user).
+
+    Retries and double submits with the same key are answered from this record instead of
+    running the action again (see meinplugin/idempotency.py). Purged after a day.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('User')
+    )
+    key = models.CharField(max_length=100, verbose_name=_('Key'))
+
+    # Stored API response (not set for form POSTs, which just redirect)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Status Code'))
+    response = models.JSONField(null=True, blank=True, verbose_name=_('Response'))
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique_per_user'),
+        ]
+        indexes = [
+            # Purge of old keys
+            models.Index(fields=['created_at'], name='idempotency_key_created_idx'),
+        ]
+        verbose_name = _('Idempotency Key')
+        verbose_name_plural = _('Idempotency Keys')
+
+    def __str__(self):
+        return f'{self.user_id}:{self.key}'
@@ -0,0 +1,113 @@
+# meinplugin/pagination.py
+"""
+Keyset (cursor) pagination for loan lists.
+
+Instead of OFFSET, each page continues after the (loan_date, id) of the last row of the
+previous page, so deep pages cost the same as the first one and no COUNT(*) is needed.
+Backed by the (loan_date, id) indexes declared on Loan.Meta.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator (newest first)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by (date_field, id), newest first.
+
+    Cursors are opaque strings: 'n' (next) or 'p' (previous) plus the key of the row
+    the page starts after. An invalid cursor raises ValueError.
+    """
+
+    def __init__(self, queryset, per_page, date_field='loan_date'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.date_field = date_field
+
+    @staticmethod
+    def encode_cursor(direction, value, pk):
+        raw = f"{direction}|{value.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, datetime.fromisoformat(value), int(pk)
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    def _cursor_for(self, direction, obj):
+        return self.encode_cursor(direction, getattr(obj, self.date_field), obj.pk)
+
+    def page(self, cursor=None):
+        """Returns the page for 'cursor' (the first page if it is empty)."""
+        field = self.date_field
+        size = self.per_page
+
+        if not cursor:
+            rows = list(self.queryset.order_by(f'-{field}', '-id')[:size + 1])
+            has_more = len(rows) > size
+            rows = rows[:size]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor_for('n', rows[-1]) if has_more else None,
+            )
+
+        direction, value, pk = self.decode_cursor(cursor)
+
+        if direction == 'n':
+            # Rows "older" than the cursor, i.e. (date, id) < (value, pk)
+            rows = list(
+                self.queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+                ).order_by(f'-{field}', '-id')[:size + 1]
+            )
+            has_more = len(rows) > size
+            rows = rows[:size]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor_for('n', rows[-1]) if has_more else None,
+                previous_cursor=self._cursor_for('p', rows[0]) if rows else None,
+            )
+
+        # direction == 'p': rows "newer" than the cursor, fetched ascending and reversed
+        rows = list(
+            self.queryset.filter(
+                Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+            ).order_by(field, 'id')[:size + 1]
+        )
+        has_more = len(rows) > size
+        rows = list(reversed(rows[:size]))
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor_for('n', rows[-1]) if rows else None,
+            previous_cursor=self._cursor_for('p', rows[0]) if has_more else None,
+        )
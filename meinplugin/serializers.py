@@ -0,0 +1,92 @@
+# meinplugin/serializers.py
+"""DRF serializers for the loan JSON API (see api.py)."""
+from rest_framework import serializers
+
+from .models import CustomerLoanSummary, Loan, LoanedItem
+
+
+class LoanedItemSerializer(serializers.ModelSerializer):
+    """Serializer for LoanedItem (expects stock_item__part to be select_related)."""
+
+    serial = serializers.CharField(source='stock_item.serial', read_only=True)
+    part_name = serializers.CharField(source='stock_item.part.full_name', read_only=True)
+
+    class Meta:
+        model = LoanedItem
+        fields = ['pk', 'loan', 'stock_item', 'serial', 'part_name', 'status']
+        read_only_fields = fields
+
+
+class LoanSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Loan.
+
+    Context options (set by the API views from the query string):
+    - 'fields': only these fields are returned (?fields=pk,status)
+    - 'include_items': embed the LoanedItems (?include=items), which must be prefetched
+    """
+
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+    items = LoanedItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Loan
+        fields = [
+            'pk', 'customer', 'customer_name', 'reference', 'notes',
+            'loan_date', 'start_date', 'due_date', 'return_date', 'status',
+            'items_pending', 'items_on_loan', 'items_returned', 'updated_at',
+            'items',
+        ]
+        read_only_fields = [
+            'loan_date', 'return_date', 'status',
+            'items_pending', 'items_on_loan', 'items_returned', 'updated_at',
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if not self.context.get('include_items'):
+            self.fields.pop('items', None)
+
+        selected = self.context.get('fields')
+        if selected:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+    def validate_customer(self, customer):
+        if not customer.is_customer:
+            raise serializers.ValidationError("Company is not a customer")
+        return customer
+
+
+class CustomerLoanSummarySerializer(serializers.ModelSerializer):
+    """Serializer for CustomerLoanSummary (expects customer to be select_related)."""
+
+    customer_name = serializers.CharField(source='customer.name', read_only=True)
+
+    class Meta:
+        model = CustomerLoanSummary
+        fields = [
+            'customer', 'customer_name', 'pending_loans', 'active_loans', 'overdue_loans',
+            'items_pending', 'items_on_loan', 'updated_at',
+        ]
+        read_only_fields = fields
+
+
+class LoanAddItemsSerializer(serializers.Serializer):
+    """Payload of LoanAddItems: serial numbers or StockItem pks."""
+
+    items = serializers.ListField(child=serializers.CharField(max_length=100), allow_empty=False)
+
+
+class LoanIssueSerializer(serializers.Serializer):
+    """Payload of LoanIssue: LoanedItem pks (omitted -> all pending items)."""
+
+    items = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+
+class LoanReturnSerializer(serializers.Serializer):
+    """Payload of LoanReturn: LoanedItem pks and the return location."""
+
+    items = serializers.ListField(child=serializers.IntegerField(min_value=1))
+    location = serializers.IntegerField(min_value=1)
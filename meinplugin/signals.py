@@ -0,0 +1,113 @@
+# meinplugin/signals.py
+"""Signal receivers of the loan plugin (imported by core.py to register them)."""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from plugin.models import PluginSetting
+from stock.models import StockLocation
+
+from .caching import bump_loan_cache_version, invalidate_stock_loan_history
+from .models import CustomerLoanSummary, Loan, LoanedItem
+
+
+_state = threading.local()
+
+
+@contextmanager
+def bookkeeping_suspended():
+    """
+    Skips the counter, summary and cache receivers of loans and items inside the block.
+
+    For bulk jobs which keep the derived data consistent themselves (archive task).
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def _suspended():
+    return getattr(_state, 'suspended', False)
+
+
+@receiver(post_save, sender=StockLocation, dispatch_uid='loan_plugin_location_saved')
+@receiver(post_delete, sender=StockLocation, dispatch_uid='loan_plugin_location_deleted')
+def location_changed(sender, instance, **kwargs):
+    """Drops the cached loan location if that location was changed or deleted."""
+    from .core import invalidate_loan_location_cache
+    invalidate_loan_location_cache(location_pk=instance.pk)
+
+
+@receiver(post_save, sender=PluginSetting, dispatch_uid='loan_plugin_setting_saved')
+@receiver(post_delete, sender=PluginSetting, dispatch_uid='loan_plugin_setting_deleted')
+def plugin_setting_changed(sender, instance, **kwargs):
+    """Drops the cached location when one of the location settings changes."""
+    from .core import LOCATION_SETTINGS, invalidate_loan_location_cache
+    if instance.key in LOCATION_SETTINGS:
+        invalidate_loan_location_cache(setting=instance.key)
+
+
+@receiver(post_delete, sender=LoanedItem, dispatch_uid='loan_plugin_item_deleted')
+def loaned_item_deleted(sender, instance, origin=None, **kwargs):
+    """Keeps the item counters of the Loan in sync when a LoanedItem is deleted."""
+    if _suspended():
+        return
+    invalidate_stock_loan_history(instance.stock_item_id)
+    # Cascade from deleting the Loan (instance or queryset): the loan row goes away and
+    # loan_summary_deleted rebuilds the customer summary, nothing to count down here
+    if isinstance(origin, Loan) or getattr(origin, 'model', None) is Loan:
+        return
+    status = getattr(instance, '_stored_status', None) or instance.status
+    loan_id = getattr(instance, '_stored_loan_id', None) or instance.loan_id
+    Loan.apply_item_deltas(loan_id, {status: -1})
+    Loan.sync_status(loan_id)
+    bump_loan_cache_version(loan_id)
+
+
+@receiver(post_save, sender=LoanedItem, dispatch_uid='loan_plugin_item_saved')
+def loaned_item_saved(sender, instance, **kwargs):
+    """Invalidates the cached fragments of the item's loan and the item's loan history."""
+    if _suspended():
+        return
+    bump_loan_cache_version(instance.loan_id)
+    invalidate_stock_loan_history(instance.stock_item_id)
+
+
+@receiver(post_save, sender=Loan, dispatch_uid='loan_plugin_loan_saved')
+@receiver(post_delete, sender=Loan, dispatch_uid='loan_plugin_loan_deleted')
+def loan_changed(sender, instance, **kwargs):
+    """Invalidates the cached fragments of the loan."""
+    if _suspended():
+        return
+    bump_loan_cache_version(instance.pk)
+
+
+@receiver(post_save, sender=Loan, dispatch_uid='loan_plugin_summary_saved')
+def loan_summary_saved(sender, instance, created, raw=False, **kwargs):
+    """Moves the loan between the counters of the customer summary."""
+    if raw or _suspended():
+        return
+
+    if created:
+        CustomerLoanSummary.apply_loan_change(instance, None, None)
+    elif getattr(instance, '_stored_status', None) is None:
+        # Not loaded from the database - the previous state is unknown
+        CustomerLoanSummary.rebuild([instance.customer_id])
+    else:
+        CustomerLoanSummary.apply_loan_change(instance, instance._stored_customer_id, instance._stored_status)
+
+    instance._stored_customer_id = instance.customer_id
+    instance._stored_status = instance.status
+
+
+@receiver(post_delete, sender=Loan, dispatch_uid='loan_plugin_summary_deleted')
+def loan_summary_deleted(sender, instance, **kwargs):
+    """Recalculates the customer summary (the item cascade already changed the counters)."""
+    if _suspended():
+        return
+    CustomerLoanSummary.rebuild([instance.customer_id])
@@ -0,0 +1,277 @@
+# meinplugin/tasks.py
+"""Scheduled and background tasks of the loan plugin (see SCHEDULED_TASKS in core.py)."""
+import logging
+import time
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+logger = logging.getLogger('inventree')
+
+# Number of loans changed per UPDATE / transaction by the overdue sweep
+OVERDUE_CHUNK_SIZE = 1000
+
+# Number of items issued / returned per transaction by a LoanJob
+JOB_CHUNK_SIZE = 100
+
+# Open jobs without progress for this long are queued again by resume_loan_jobs
+JOB_STALE_MINUTES = 10
+
+# Number of loans moved to the archive per transaction
+ARCHIVE_CHUNK_SIZE = 200
+
+
+def _move_status(queryset, new_status, chunk_size):
+    """Sets 'new_status' on all loans of 'queryset' in chunks of pks, returns the row count."""
+    from .caching import bump_loan_cache_version
+    from .models import CustomerLoanSummary
+
+    updated = 0
+    while True:
+        with transaction.atomic():
+            # Locked, so the old statuses are still valid for the customer summary
+            rows = list(
+                queryset.select_for_update().order_by('pk').values_list('pk', 'customer_id', 'status')[:chunk_size]
+            )
+            if not rows:
+                return updated
+            pks = [pk for pk, _customer, _status in rows]
+            updated += queryset.filter(pk__in=pks).update(status=new_status, updated_at=timezone.now())
+
+            # One counter UPDATE per customer of the chunk
+            changes = {}
+            for _pk, customer_pk, old_status in rows:
+                deltas = changes.setdefault(customer_pk, {})
+                deltas[old_status] = deltas.get(old_status, 0) - 1
+                deltas[new_status] = deltas.get(new_status, 0) + 1
+            for customer_pk, deltas in changes.items():
+                CustomerLoanSummary.apply_status_change(customer_pk, deltas)
+
+            bump_loan_cache_version(*pks)
+
+
+def update_overdue_loans(chunk_size=OVERDUE_CHUNK_SIZE):
+    """
+    Moves ACTIVE loans past their due date to OVERDUE.
+
+    Runs as chunked bulk UPDATEs on the Loan(status, due_date) index - no model instances
+    are loaded. OVERDUE loans whose due date was extended go back to ACTIVE, so the task
+    is idempotent and safe to run as often as wanted.
+    Returns the number of changed rows and the runtime.
+    """
+    from .models import Loan
+
+    start = time.monotonic()
+    today = date.today()
+
+    overdue = _move_status(
+        Loan.objects.filter(status=Loan.LoanStatus.ACTIVE, due_date__lt=today),
+        Loan.LoanStatus.OVERDUE, chunk_size,
+    )
+    reactivated = _move_status(
+        Loan.objects.filter(status=Loan.LoanStatus.OVERDUE, due_date__gte=today),
+        Loan.LoanStatus.ACTIVE, chunk_size,
+    )
+
+    result = {
+        'overdue': overdue,
+        'reactivated': reactivated,
+        'seconds': round(time.monotonic() - start, 3),
+    }
+    logger.info("LoanPlugin: overdue sweep changed %s loan(s) to OVERDUE, %s back to ACTIVE in %ss",
+                overdue, reactivated, result['seconds'])
+    return result
+
+
+def run_loan_job(job_pk, chunk_size=JOB_CHUNK_SIZE):
+    """
+    Processes a LoanJob in chunks, each chunk in its own transaction.
+
+    The items are walked once in pk order. Only items still in the source status (PENDING
+    for issue, ON_LOAN for return) are picked up, so running the task again resumes an
+    interrupted job. Items which could not be processed (e.g. still out on another loan)
+    are counted as skipped and reported on the job.
+    """
+    from plugin import registry
+
+    from .models import LoanedItem, LoanJob
+
+    job = LoanJob.objects.select_related('loan', 'return_location', 'user').filter(pk=job_pk).first()
+    if job is None or job.status == LoanJob.JobStatus.DONE:
+        return
+
+    # A resumed job tries its skipped items again
+    LoanJob.objects.filter(pk=job.pk).update(
+        status=LoanJob.JobStatus.RUNNING, skipped=0, error='', updated_at=timezone.now()
+    )
+
+    if job.action == LoanJob.Action.ISSUE:
+        source_status = LoanedItem.ItemStatus.PENDING
+    else:
+        source_status = LoanedItem.ItemStatus.ON_LOAN
+    remaining = LoanedItem.objects.filter(
+        loan_id=job.loan_id, pk__in=job.item_pks, status=source_status
+    ).order_by('pk')
+
+    skipped = 0
+    try:
+        plugin = registry.get_plugin('loan')
+        if not plugin:
+            raise RuntimeError("Loan plugin (slug='loan') not found or not active.")
+        if job.action == LoanJob.Action.RETURN and job.return_location is None:
+            raise ValueError("Return location of the job no longer exists.")
+
+        last_pk = 0
+        while True:
+            # Keyset cursor - skipped items are not selected again
+            chunk = list(remaining.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            with transaction.atomic():
+                if job.action == LoanJob.Action.ISSUE:
+                    count = plugin.issue_loan_items(chunk, job.user)
+                else:
+                    count = plugin.return_loan_items(chunk, job.return_location, job.user)
+                # Progress commits together with the chunk
+                LoanJob.objects.filter(pk=job.pk).update(
+                    processed=F('processed') + count,
+                    skipped=F('skipped') + len(chunk) - count,
+                    updated_at=timezone.now(),
+                )
+            skipped += len(chunk) - count
+
+    except Exception as e:
+        logger.exception("LoanPlugin: job %s failed", job.pk)
+        LoanJob.objects.filter(pk=job.pk).update(status=LoanJob.JobStatus.FAILED, error=str(e))
+        return
+
+    error = ''
+    if skipped:
+        logger.warning("LoanPlugin: job %s skipped %s item(s)", job.pk, skipped)
+        error = f"{skipped} item(s) skipped (changed concurrently or still on another loan)"
+    LoanJob.objects.filter(pk=job.pk).update(status=LoanJob.JobStatus.DONE, error=error, updated_at=timezone.now())
+
+
+def resume_loan_jobs():
+    """Queues open LoanJobs again which made no progress for a while (e.g. after a worker crash)."""
+    from datetime import timedelta
+
+    from InvenTree.tasks import offload_task
+
+    from .models import LoanJob
+
+    stale = LoanJob.objects.filter(
+        status__in=[LoanJob.JobStatus.QUEUED, LoanJob.JobStatus.RUNNING],
+        updated_at__lt=timezone.now() - timedelta(minutes=JOB_STALE_MINUTES),
+    ).values_list('pk', flat=True)
+
+    for job_pk in stale:
+        logger.info("LoanPlugin: resuming job %s", job_pk)
+        offload_task('meinplugin.tasks.run_loan_job', job_pk)
+
+
+def archive_closed_loans(days=None, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Moves closed loans older than 'days' into the ArchivedLoan / ArchivedLoanItem tables.
+
+    RETURNED loans count from their return date, CANCELLED ones from their last change.
+    Each chunk is copied and deleted in one transaction, so an interrupted run just
+    continues with the next one. 'days' defaults to the ARCHIVE_AFTER_DAYS setting,
+    0 disables archiving. Returns the number of archived loans / items and the runtime.
+    """
+    from datetime import timedelta
+
+    from plugin import registry
+
+    from .caching import invalidate_stock_loan_history
+    from .models import ArchivedLoan, ArchivedLoanItem, Loan, LoanedItem
+    from .signals import bookkeeping_suspended
+
+    if days is None:
+        plugin = registry.get_plugin('loan')
+        days = int(plugin.get_setting('ARCHIVE_AFTER_DAYS') or 0) if plugin else 0
+    if days <= 0:
+        return {'loans': 0, 'items': 0, 'seconds': 0}
+
+    start = time.monotonic()
+    closed = Loan.objects.filter(
+        Q(status=Loan.LoanStatus.RETURNED, return_date__lt=date.today() - timedelta(days=days))
+        | Q(status=Loan.LoanStatus.CANCELLED, updated_at__lt=timezone.now() - timedelta(days=days))
+    )
+
+    loans_archived = 0
+    items_archived = 0
+    while True:
+        with transaction.atomic():
+            pks = list(closed.select_for_update().order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                break
+
+            ArchivedLoan.objects.bulk_create([
+                ArchivedLoan(
+                    id=row['pk'],
+                    customer_id=row['customer_id'],
+                    customer_name=row['customer__name'] or '',
+                    reference=row['reference'],
+                    notes=row['notes'],
+                    loan_date=row['loan_date'],
+                    start_date=row['start_date'],
+                    due_date=row['due_date'],
+                    return_date=row['return_date'],
+                    status=row['status'],
+                    created_by_id=row['created_by_id'],
+                )
+                for row in Loan.objects.filter(pk__in=pks).values(
+                    'pk', 'customer_id', 'customer__name', 'reference', 'notes', 'loan_date',
+                    'start_date', 'due_date', 'return_date', 'status', 'created_by_id',
+                )
+            ])
+
+            item_rows = list(
+                LoanedItem.objects.filter(loan_id__in=pks).values_list(
+                    'loan_id', 'stock_item_id', 'stock_item__serial', 'stock_item__part__name', 'status'
+                )
+            )
+            ArchivedLoanItem.objects.bulk_create([
+                ArchivedLoanItem(
+                    archived_loan_id=loan_pk, stock_item_id=stock_item_pk,
+                    serial=serial or '', part_name=part_name or '', status=status,
+                )
+                for loan_pk, stock_item_pk, serial, part_name, status in item_rows
+            ], batch_size=1000)
+
+            # Closed loans are not counted anywhere - skip the per-row bookkeeping receivers
+            with bookkeeping_suspended():
+                LoanedItem.objects.filter(loan_id__in=pks).delete()
+                Loan.objects.filter(pk__in=pks).delete()
+
+            invalidate_stock_loan_history(*{row[1] for row in item_rows})
+
+        loans_archived += len(pks)
+        items_archived += len(item_rows)
+
+    result = {
+        'loans': loans_archived,
+        'items': items_archived,
+        'seconds': round(time.monotonic() - start, 3),
+    }
+    logger.info("LoanPlugin: archived %s loan(s) with %s item(s) in %ss",
+                loans_archived, items_archived, result['seconds'])
+    return result
+
+
+def purge_idempotency_keys():
+    """Deletes idempotency keys older than IDEMPOTENCY_KEY_HOURS, returns the number of deleted keys."""
+    from datetime import timedelta
+
+    from .idempotency import IDEMPOTENCY_KEY_HOURS
+    from .models import IdempotencyKey
+
+    deleted, _details = IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - timedelta(hours=IDEMPOTENCY_KEY_HOURS)
+    ).delete()
+    return deleted
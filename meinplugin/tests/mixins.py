@@ -0,0 +1,52 @@
+# meinplugin/tests/mixins.py
+"""Shared test data of the loan tests."""
+from datetime import date, timedelta
+
+from company.models import Company
+from part.models import Part
+from plugin import registry
+from stock.models import StockItem, StockLocation
+
+from meinplugin.models import Loan, LoanedItem
+
+
+class LoanTestMixin:
+    """Customer, serialized stock and configured locations for the loan tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.customer = Company.objects.create(name='Customer', is_customer=True)
+        cls.store = StockLocation.objects.create(name='Store')
+        cls.loan_location = StockLocation.objects.create(name='On Loan')
+        cls.return_location = StockLocation.objects.create(name='Returns')
+        cls.part = Part.objects.create(name='Loan Part', description='Lent out by serial', trackable=True)
+
+    def setUp(self):
+        super().setUp()
+        self.plugin = registry.get_plugin('loan')
+        self.plugin.set_setting('LOAN_LOCATION', self.loan_location.pk)
+        self.plugin.set_setting('DEFAULT_RETURN_LOCATION', self.return_location.pk)
+
+    def create_stock_items(self, count, part=None, serial=None):
+        """'count' serialized StockItems in the store (serials LOAN-<n> unless given)."""
+        first = StockItem.objects.count() + 1
+        return [
+            StockItem.objects.create(
+                part=part or self.part, quantity=1, location=self.store,
+                serial=serial or f'LOAN-{first + index}',
+            )
+            for index in range(count)
+        ]
+
+    def create_loan(self, item_count, customer=None):
+        """A PENDING loan with 'item_count' PENDING items, returns (loan, items)."""
+        loan = Loan.objects.create(customer=customer or self.customer, due_date=date.today() + timedelta(days=7))
+        items = [LoanedItem.objects.create(loan=loan, stock_item=stock_item)
+                 for stock_item in self.create_stock_items(item_count)]
+        loan.refresh_from_db()
+        return loan, items
+
+    def assertCounters(self, loan, pending, on_loan, returned):
+        loan.refresh_from_db()
+        self.assertEqual((loan.items_pending, loan.items_on_loan, loan.items_returned), (pending, on_loan, returned))
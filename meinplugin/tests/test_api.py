@@ -0,0 +1,60 @@
+# meinplugin/tests/test_api.py
+"""Idempotent issue / return requests of the loan API."""
+from django.urls import reverse
+
+from InvenTree.unit_test import InvenTreeTestCase
+
+from meinplugin.models import IdempotencyKey
+from meinplugin.tests.mixins import LoanTestMixin
+
+
+class IdempotentActionTest(LoanTestMixin, InvenTreeTestCase):
+    """A retried request with the same key runs its action once; failed actions keep no key."""
+
+    def post(self, name, loan, data, key):
+        return self.client.post(
+            reverse(f'plugin:loan:{name}', kwargs={'pk': loan.pk}), data,
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay(self):
+        loan, items = self.create_loan(2)
+
+        first = self.post('api_loan_issue', loan, {'items': [items[0].pk]}, 'issue-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['issued'], 1)
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+
+        replay = self.post('api_loan_issue', loan, {'items': [items[0].pk]}, 'issue-1')
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.json(), first.json())
+        self.assertCounters(loan, 1, 1, 0)
+
+        # A new key is a new action
+        self.assertEqual(self.post('api_loan_issue', loan, {}, 'issue-2').json()['issued'], 1)
+        self.assertCounters(loan, 0, 2, 0)
+
+    def test_failed_action_keeps_no_key(self):
+        loan, items = self.create_loan(1)
+        self.plugin.issue_loan_items(items, self.user)
+        data = {'items': [items[0].pk], 'location': self.return_location.pk}
+
+        failed = self.post('api_loan_return', loan, {**data, 'location': 0}, 'return-1')
+        self.assertEqual(failed.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.filter(key='return-1').exists())
+
+        # The retry with the same key really returns the item
+        retry = self.post('api_loan_return', loan, data, 'return-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['returned'], 1)
+        self.assertNotIn('Idempotent-Replayed', retry.headers)
+        self.assertCounters(loan, 0, 0, 1)
+
+    def test_invalid_payload(self):
+        loan, _items = self.create_loan(1)
+
+        response = self.post('api_loan_add', loan, {'items': 'LOAN-1'}, 'add-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json()['details'])
+        self.assertFalse(IdempotencyKey.objects.exists())
@@ -0,0 +1,229 @@
+# meinplugin/tests/test_loans.py
+"""Item counters and status transitions of loans."""
+from datetime import date
+
+from django.db import IntegrityError, transaction
+
+from company.models import Company
+from InvenTree.unit_test import InvenTreeTestCase
+from part.models import Part
+from stock.models import StockItem
+
+from meinplugin.models import CustomerLoanSummary, Loan, LoanedItem
+from meinplugin.tests.mixins import LoanTestMixin
+
+
+class LoanStatusTest(LoanTestMixin, InvenTreeTestCase):
+    """Loan.sync_status() transitions driven by issue / return."""
+
+    def test_issue_in_two_steps(self):
+        loan, items = self.create_loan(3)
+        self.assertEqual(loan.status, Loan.LoanStatus.PENDING)
+
+        # The first issued item activates the loan, the others stay pending
+        self.assertEqual(self.plugin.issue_loan_items(items[:1], self.user), 1)
+        self.assertCounters(loan, 2, 1, 0)
+        self.assertEqual(loan.status, Loan.LoanStatus.ACTIVE)
+        self.assertTrue(loan.is_open)
+
+        # ... and can still be issued afterwards
+        self.assertEqual(self.plugin.issue_loan_items(items[1:], self.user), 2)
+        self.assertCounters(loan, 0, 3, 0)
+        self.assertEqual(loan.status, Loan.LoanStatus.ACTIVE)
+        for stock_item in StockItem.objects.filter(loan_records__loan=loan):
+            self.assertEqual(stock_item.location_id, self.loan_location.pk)
+
+    def test_issue_all_view_after_partial_issue(self):
+        loan, items = self.create_loan(2)
+        self.plugin.issue_loan_item(items[0], self.user)
+
+        response = self.client.post(loan.get_absolute_url(), {'action': 'issue_all'})
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(loan, 0, 2, 0)
+
+    def test_add_items_to_active_loan(self):
+        loan, items = self.create_loan(1)
+        self.plugin.issue_loan_items(items, self.user)
+        loan.refresh_from_db()
+
+        stock_item = self.create_stock_items(1)[0]
+        added, errors = self.plugin.add_items_to_loan(loan, [stock_item.serial])
+        self.assertEqual((len(added), errors), (1, {}))
+        self.assertCounters(loan, 1, 1, 0)
+
+    def test_returned_when_all_items_are_back(self):
+        loan, items = self.create_loan(2)
+        self.plugin.issue_loan_items(items, self.user)
+
+        self.plugin.return_loan_items(items[:1], self.return_location, self.user)
+        self.assertCounters(loan, 0, 1, 1)
+        self.assertEqual(loan.status, Loan.LoanStatus.ACTIVE)
+
+        self.plugin.return_loan_items(items[1:], self.return_location, self.user)
+        self.assertCounters(loan, 0, 0, 2)
+        self.assertEqual(loan.status, Loan.LoanStatus.RETURNED)
+        self.assertEqual(loan.return_date, date.today())
+        self.assertFalse(loan.is_open)
+
+    def test_returned_when_last_pending_item_is_deleted(self):
+        loan, items = self.create_loan(2)
+        self.plugin.issue_loan_items(items[:1], self.user)
+        self.plugin.return_loan_items(items[:1], self.return_location, self.user)
+        self.assertCounters(loan, 1, 0, 1)
+        self.assertEqual(loan.status, Loan.LoanStatus.ACTIVE)
+
+        items[1].delete()
+        self.assertCounters(loan, 0, 0, 1)
+        self.assertEqual(loan.status, Loan.LoanStatus.RETURNED)
+
+
+class LoanCounterTest(LoanTestMixin, InvenTreeTestCase):
+    """The item counters on Loan follow every change of its items."""
+
+    def test_counters_after_issue_return_delete(self):
+        loan, items = self.create_loan(4)
+        self.assertCounters(loan, 4, 0, 0)
+
+        self.plugin.issue_loan_items(items[:3], self.user)
+        self.assertCounters(loan, 1, 3, 0)
+
+        self.plugin.return_loan_items(items[:2], self.return_location, self.user)
+        self.assertCounters(loan, 1, 1, 2)
+
+        # Issuing / returning an item twice changes nothing
+        self.assertEqual(self.plugin.issue_loan_items(items[:1], self.user), 0)
+        self.assertEqual(self.plugin.return_loan_items(items[:1], self.return_location, self.user), 0)
+        self.assertCounters(loan, 1, 1, 2)
+
+        LoanedItem.objects.get(pk=items[2].pk).delete()
+        self.assertCounters(loan, 1, 0, 2)
+        items[3].delete()
+        self.assertCounters(loan, 0, 0, 2)
+
+    def test_counters_when_item_moves_to_other_loan(self):
+        loan, items = self.create_loan(2)
+        other, _other_items = self.create_loan(1)
+
+        item = LoanedItem.objects.get(pk=items[0].pk)
+        item.loan = other
+        item.save()
+        self.assertCounters(loan, 1, 0, 0)
+        self.assertCounters(other, 2, 0, 0)
+
+    def test_deleting_loan_leaves_no_counts(self):
+        loan, items = self.create_loan(2)
+        self.plugin.issue_loan_items(items[:1], self.user)
+
+        loan.delete()
+        self.assertFalse(LoanedItem.objects.filter(pk__in=[item.pk for item in items]).exists())
+        summary = CustomerLoanSummary.objects.get(customer=self.customer)
+        self.assertEqual((summary.active_loans, summary.items_pending, summary.items_on_loan), (0, 0, 0))
+
+
+class LoanedItemConstraintTest(LoanTestMixin, InvenTreeTestCase):
+    """A StockItem can only be ON_LOAN on one loan at a time."""
+
+    def test_one_on_loan_record_per_stock_item(self):
+        loan, items = self.create_loan(1)
+        self.plugin.issue_loan_items(items, self.user)
+        stock_item = items[0].stock_item
+        other = Loan.objects.create(customer=self.customer, due_date=loan.due_date)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            LoanedItem.objects.create(loan=other, stock_item=stock_item, status=LoanedItem.ItemStatus.ON_LOAN)
+
+        # Reservations and history records of the same item are allowed
+        LoanedItem.objects.create(loan=other, stock_item=stock_item, status=LoanedItem.ItemStatus.PENDING)
+        LoanedItem.objects.create(loan=other, stock_item=stock_item, status=LoanedItem.ItemStatus.RETURNED)
+        self.assertEqual(LoanedItem.objects.filter(stock_item=stock_item).on_loan().count(), 1)
+
+
+class AddItemsToLoanTest(LoanTestMixin, InvenTreeTestCase):
+    """add_items_to_loan() reports every identifier which can't be added and adds the rest."""
+
+    def test_errors_per_identifier(self):
+        loan, items = self.create_loan(1)
+        other, other_items = self.create_loan(1)
+
+        free, sold = self.create_stock_items(2)
+        StockItem.objects.filter(pk=sold.pk).update(customer=self.customer)
+
+        other_part = Part.objects.create(name='Other Part', description='Shares a serial', trackable=True)
+        self.create_stock_items(1, serial='SHARED')
+        self.create_stock_items(1, part=other_part, serial='SHARED')
+
+        added, errors = self.plugin.add_items_to_loan(loan, [
+            free.serial,
+            str(free.pk),
+            items[0].stock_item.serial,
+            other_items[0].stock_item.serial,
+            sold.serial,
+            'SHARED',
+            'NO-SUCH-SERIAL',
+            '  ',
+        ])
+
+        self.assertEqual([item.stock_item_id for item in added], [free.pk])
+        self.assertEqual(errors, {
+            str(free.pk): "Duplicate stock item in this batch.",
+            items[0].stock_item.serial: "Already on this loan.",
+            other_items[0].stock_item.serial: f"Booked on Loan #{other.pk} in this period.",
+            sold.serial: "Stock item is not available.",
+            'SHARED': "Serial number is ambiguous, use the stock item PK.",
+            'NO-SUCH-SERIAL': "No serialized stock item found.",
+        })
+        self.assertCounters(loan, 2, 0, 0)
+
+    def test_closed_loan(self):
+        loan, items = self.create_loan(1)
+        self.plugin.issue_loan_items(items, self.user)
+        self.plugin.return_loan_items(items, self.return_location, self.user)
+
+        with self.assertRaises(ValueError):
+            self.plugin.add_items_to_loan(loan, [self.create_stock_items(1)[0].serial])
+        self.assertCounters(loan, 0, 0, 1)
+
+
+class CustomerLoanSummaryTest(LoanTestMixin, InvenTreeTestCase):
+    """The incrementally updated summary always equals a rebuild from the loan table."""
+
+    def summary(self):
+        return CustomerLoanSummary.objects.filter(customer=self.customer).values(
+            'pending_loans', 'active_loans', 'overdue_loans', 'items_pending', 'items_on_loan'
+        ).first()
+
+    def assertSummary(self, **expected):
+        summary = self.summary()
+        self.assertEqual(summary, {
+            'pending_loans': 0, 'active_loans': 0, 'overdue_loans': 0, 'items_pending': 0, 'items_on_loan': 0,
+            **expected,
+        })
+        CustomerLoanSummary.rebuild([self.customer.pk])
+        self.assertEqual(self.summary(), summary)
+
+    def test_summary_follows_loans(self):
+        loan, items = self.create_loan(3)
+        self.create_loan(1)
+        self.assertSummary(pending_loans=2, items_pending=4)
+
+        self.plugin.issue_loan_items(items[:2], self.user)
+        self.assertSummary(pending_loans=1, active_loans=1, items_pending=2, items_on_loan=2)
+
+        self.plugin.return_loan_items(items[:1], self.return_location, self.user)
+        self.assertSummary(pending_loans=1, active_loans=1, items_pending=2, items_on_loan=1)
+
+        items[2].delete()
+        self.plugin.return_loan_items(items[1:2], self.return_location, self.user)
+        self.assertSummary(pending_loans=1, items_pending=1)
+
+    def test_summary_moves_with_customer(self):
+        loan, _items = self.create_loan(2)
+        other_customer = Company.objects.create(name='Other Customer', is_customer=True)
+
+        loan.customer = other_customer
+        loan.save()
+        self.assertSummary()
+        self.assertEqual(
+            CustomerLoanSummary.objects.filter(customer=other_customer).values_list('pending_loans', 'items_pending').get(),
+            (1, 2),
+        )
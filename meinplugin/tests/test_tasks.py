@@ -0,0 +1,85 @@
+# meinplugin/tests/test_tasks.py
+"""Background jobs and the archive task resume where an interrupted run stopped."""
+from datetime import date, timedelta
+from unittest import mock
+
+from InvenTree.unit_test import InvenTreeTestCase
+
+from meinplugin.models import ArchivedLoan, ArchivedLoanItem, Loan, LoanedItem, LoanJob
+from meinplugin.tasks import archive_closed_loans, run_loan_job
+from meinplugin.tests.mixins import LoanTestMixin
+
+
+def fail_on_call(original, call_number):
+    """side_effect which runs 'original' but raises on the given call."""
+    calls = []
+
+    def side_effect(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == call_number:
+            raise RuntimeError("Worker stopped")
+        return original(*args, **kwargs)
+
+    return side_effect
+
+
+class ArchiveResumeTest(LoanTestMixin, InvenTreeTestCase):
+    """archive_closed_loans() commits per chunk and continues after an error."""
+
+    def create_returned_loans(self, count):
+        loans = []
+        for _index in range(count):
+            loan, items = self.create_loan(2)
+            self.plugin.issue_loan_items(items, self.user)
+            self.plugin.return_loan_items(items, self.return_location, self.user)
+            loans.append(loan)
+        Loan.objects.filter(pk__in=[loan.pk for loan in loans]).update(return_date=date.today() - timedelta(days=60))
+        return loans
+
+    def test_resume_after_failed_chunk(self):
+        loans = self.create_returned_loans(3)
+        open_loan, _items = self.create_loan(1)
+
+        original = ArchivedLoanItem.objects.bulk_create
+        with mock.patch.object(ArchivedLoanItem.objects, 'bulk_create', side_effect=fail_on_call(original, 2)):
+            with self.assertRaises(RuntimeError):
+                archive_closed_loans(days=30, chunk_size=1)
+
+        # The first chunk is archived, the failed one is rolled back completely
+        self.assertEqual(list(ArchivedLoan.objects.values_list('pk', flat=True)), [loans[0].pk])
+        self.assertEqual(ArchivedLoanItem.objects.count(), 2)
+        self.assertEqual(Loan.objects.filter(pk__in=[loan.pk for loan in loans]).count(), 2)
+
+        result = archive_closed_loans(days=30, chunk_size=1)
+        self.assertEqual((result['loans'], result['items']), (2, 4))
+        self.assertEqual(ArchivedLoan.objects.count(), 3)
+        self.assertEqual(ArchivedLoanItem.objects.count(), 6)
+        self.assertEqual(list(Loan.objects.values_list('pk', flat=True)), [open_loan.pk])
+
+        # Nothing left to do
+        self.assertEqual(archive_closed_loans(days=30)['loans'], 0)
+
+
+class LoanJobResumeTest(LoanTestMixin, InvenTreeTestCase):
+    """run_loan_job() picks up the remaining items of a failed job."""
+
+    def test_resume_issue_job(self):
+        loan, items = self.create_loan(3)
+        job = LoanJob.objects.create(
+            loan=loan, action=LoanJob.Action.ISSUE, item_pks=[item.pk for item in items],
+            user=self.user, total=len(items),
+        )
+
+        original = self.plugin.issue_loan_items
+        with mock.patch.object(self.plugin, 'issue_loan_items', side_effect=fail_on_call(original, 2)):
+            run_loan_job(job.pk, chunk_size=1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.error), (LoanJob.JobStatus.FAILED, 1, "Worker stopped"))
+        self.assertCounters(loan, 2, 1, 0)
+
+        run_loan_job(job.pk, chunk_size=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed, job.skipped, job.error), (LoanJob.JobStatus.DONE, 3, 0, ''))
+        self.assertCounters(loan, 0, 3, 0)
+        self.assertEqual(LoanedItem.objects.filter(loan=loan).on_loan().count(), 3)
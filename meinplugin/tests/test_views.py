@@ -0,0 +1,55 @@
+# meinplugin/tests/test_views.py
+"""Query count regression tests of the loan views."""
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from company.models import Company
+from InvenTree.unit_test import InvenTreeTestCase
+
+from meinplugin.models import Loan
+from meinplugin.views import LoanListView
+
+
+# Without a fragment cache every request renders all rows of its page
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class LoanListViewQueryTest(InvenTreeTestCase):
+    """LoanListView renders a page with a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.customers = [
+            Company.objects.create(name=f'Customer {index}', is_customer=True) for index in range(5)
+        ]
+
+    def create_loans(self, count):
+        due_date = date.today() + timedelta(days=7)
+        for index in range(count):
+            loan = Loan.objects.create(customer=self.customers[index % len(self.customers)], due_date=due_date)
+            Loan.objects.filter(pk=loan.pk).update(items_on_loan=2, items_returned=index % 3)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_fixed_query_count(self, url):
+        # Baseline with a single row, then a full page (paginate_by = 25) must not need more
+        self.create_loans(1)
+        expected = self.count_queries(url)
+
+        self.create_loans(40)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['loans']), LoanListView.paginate_by)
+
+    def test_page_number_pagination(self):
+        self.assert_fixed_query_count(reverse('plugin:loan:loan_list'))
+
+    def test_cursor_pagination(self):
+        self.assert_fixed_query_count(reverse('plugin:loan:loan_list') + '?cursor=')
@@ -1,6 +1,6 @@
 # meinplugin/urls.py
 from django.urls import path
-from . import views
+from . import api, views
 
 # Define URL patterns for the loan plugin
 urlpatterns = [
@@ -10,10 +10,47 @@ urlpatterns = [
     # Create a new loan (maps to 'plugin:loan:loan_create')
     path('new/', views.LoanCreateView.as_view(), name='loan_create'),
 
+    # Loan history export (maps to 'plugin:loan:loan_export')
+    path('export/', views.LoanExportView.as_view(), name='loan_export'),
+
+    # Read-only archive of closed loans (maps to 'plugin:loan:loan_archive')
+    path('archive/', views.LoanArchiveView.as_view(), name='loan_archive'),
+    path('archive/<int:pk>/', views.LoanArchiveDetailView.as_view(), name='loan_archive_detail'),
+
+    # CSV import (maps to 'plugin:loan:loan_import')
+    path('import/', views.LoanImportView.as_view(), name='loan_import'),
+
     # View details of a specific loan (maps to 'plugin:loan:loan_detail')
     path('<int:pk>/', views.LoanDetailView.as_view(), name='loan_detail'),
 
+    # Add a batch of stock items by serial / PK (maps to 'plugin:loan:loan_add_items')
+    path('<int:pk>/add_items/', views.LoanAddItemsView.as_view(), name='loan_add_items'),
+
+    # Progress of a background issue / return job (maps to 'plugin:loan:loan_job_progress')
+    path('<int:pk>/jobs/<int:job_pk>/', views.LoanJobProgressView.as_view(), name='loan_job_progress'),
+
+    # Scan-to-return page (maps to 'plugin:loan:return_desk')
+    path('returns/', views.ReturnDeskView.as_view(), name='return_desk'),
+
+    # JSON search for the return location picker (maps to 'plugin:loan:location_search')
+    path('locations/search/', views.LocationSearchView.as_view(), name='location_search'),
+
+    # Free serialized stock items of a part in a date range (maps to 'plugin:loan:availability')
+    path('availability/', views.AvailabilityView.as_view(), name='availability'),
+
+    # Staff-only instrumentation numbers (maps to 'plugin:loan:instrumentation')
+    path('instrumentation/', views.InstrumentationView.as_view(), name='instrumentation'),
+
+    # JSON API (maps to 'plugin:loan:api_...')
+    path('api/loans/', api.LoanList.as_view(), name='api_loan_list'),
+    path('api/loans/<int:pk>/', api.LoanDetail.as_view(), name='api_loan_detail'),
+    path('api/loans/<int:pk>/items/', api.LoanItemList.as_view(), name='api_loan_items'),
+    path('api/loans/<int:pk>/add/', api.LoanAddItems.as_view(), name='api_loan_add'),
+    path('api/loans/<int:pk>/issue/', api.LoanIssue.as_view(), name='api_loan_issue'),
+    path('api/loans/<int:pk>/return/', api.LoanReturn.as_view(), name='api_loan_return'),
+    path('api/items/<int:pk>/', api.LoanedItemDetail.as_view(), name='api_item_detail'),
+    path('api/customers/summary/', api.CustomerSummaryList.as_view(), name='api_customer_summary'),
+
     # TODO: Add URLs for specific actions if needed, e.g.:
-    # path('<int:pk>/add_item/', views.LoanAddItemView.as_view(), name='loan_add_item'),
     # path('item/<int:item_pk>/return/', views.LoanReturnItemView.as_view(), name='loan_return_item'),
 ]
\ No newline at end of file
@@ -1,13 +1,34 @@
 # meinplugin/views.py
-from django.views.generic import ListView, DetailView, CreateView
-from django.urls import reverse_lazy
+import hashlib
+import io
+import json
+import logging
+import re
+from datetime import date
+
+from django.views.generic import ListView, DetailView, CreateView, View
+from django.middleware.csrf import get_token
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin # Ensure user is logged in
-from django.shortcuts import get_object_or_404, redirect
-from django.http import HttpResponseForbidden # For permission checks
+from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib import messages
+from django.db import transaction
+from django.db.models import Q
+from django.http import (FileResponse, Http404, HttpResponseBadRequest, HttpResponseForbidden, # For permission checks
+                         JsonResponse, StreamingHttpResponse)
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
 
 # Import models from this plugin
-from .models import Loan, LoanedItem
-
+from .models import ArchivedLoan, ArchivedLoanItem, Loan, LoanedItem, LoanJob
+from .pagination import KeysetPaginator
+from . import export, idempotency
+from .caching import FRAGMENT_CACHE_SECONDS, get_loan_cache_version, get_loan_cache_versions, loan_fragment_key
+from .importer import LoanImporter
+from .instrumentation import get_stats, instrument, instrumented, reset_stats
+
+# Customer choices of the create form
+from company.models import Company
 # Need StockLocation for return process (if not handled purely by actions)
 from stock.models import StockLocation, StockItem
 
@@ -15,9 +36,23 @@ from stock.models import StockLocation, StockItem
 # Use InvenTree method to get plugin reference
 from plugin import registry
 
+logger = logging.getLogger('inventree')
+
+
 class LoanPluginMixin(LoginRequiredMixin):
     """Mixin to share common logic for Loan views, like getting the plugin instance."""
 
+    def dispatch(self, request, *args, **kwargs):
+        # Opt-in instrumentation (ENABLE_INSTRUMENTATION): the whole view plus the
+        # template rendering, where lazy relations in templates show up
+        name = f'view:{self.__class__.__name__}'
+        with instrument(name):
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                with instrument(f'{name}.render'):
+                    response.render()
+        return response
+
     def get_plugin(self):
         # Get reference to our plugin instance (assuming slug is 'loan')
         # Requires plugin to be loaded and activated
@@ -33,16 +68,94 @@ class LoanPluginMixin(LoginRequiredMixin):
     #         raise PermissionDenied
 
 
+# Query parameters understood by filter_loans()
+LOAN_FILTER_PARAMS = ('status', 'customer', 'due_after', 'due_before')
+
+
+def filter_loans(queryset, params):
+    """
+    Applies the list filters from 'params' (e.g. request.GET) to a Loan queryset.
+
+    All filters are plain equality / range lookups on indexed columns
+    (see Loan.Meta.indexes). Invalid values raise ValueError, which the callers turn
+    into a 400 / 404 response.
+    """
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('customer'):
+        queryset = queryset.filter(customer_id=int(params['customer']))
+    if params.get('due_after'):
+        queryset = queryset.filter(due_date__gte=date.fromisoformat(params['due_after']))
+    if params.get('due_before'):
+        queryset = queryset.filter(due_date__lte=date.fromisoformat(params['due_before']))
+    return queryset
+
+
 class LoanListView(LoanPluginMixin, ListView):
-    """View to list all Loans."""
+    """
+    View to list all Loans.
+
+    Uses normal page numbers by default. With '?cursor=' in the URL the list switches to
+    keyset pagination, which stays fast on deep pages of a long loan history.
+    """
     model = Loan
     template_name = 'meinplugin/loan_list.html' # Specify our template
     context_object_name = 'loans' # Name for the list in the template
     paginate_by = 25 # Optional pagination
 
     def get_queryset(self):
-        # Order loans, newest first
-        return Loan.objects.order_by('-loan_date')
+        # Order loans, newest first (id as tie breaker for a stable order).
+        # Customer comes from a join and "overdue" is computed in SQL, so a page renders
+        # with a fixed number of queries (item counts are the counter columns on Loan).
+        queryset = (
+            Loan.objects.select_related('customer')
+            .defer('notes')
+            .annotate(overdue=Loan.overdue_expression())
+            .order_by('-loan_date', '-id')
+        )
+        try:
+            return filter_loans(queryset, self.request.GET)
+        except (ValueError, TypeError):
+            raise Http404("Invalid filter")
+
+    def paginate_queryset(self, queryset, page_size):
+        if 'cursor' not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            self.cursor_page = paginator.page(self.request.GET.get('cursor'))
+        except ValueError:
+            raise Http404("Invalid cursor")
+        return (None, None, self.cursor_page.object_list, False)
+
+    @instrumented('view:LoanListView.get_context_data')
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_page'] = getattr(self, 'cursor_page', None)
+        # Cache key of the rendered rows: changes with any loan on the page (and the day,
+        # because of the overdue highlighting)
+        loans = context['object_list']
+        versions = get_loan_cache_versions([loan.pk for loan in loans])
+        context['fragment_cache_seconds'] = FRAGMENT_CACHE_SECONDS
+        context['rows_cache_key'] = hashlib.md5(
+            '|'.join([str(date.today())] + [loan_fragment_key(loan, versions[loan.pk]) for loan in loans]).encode()
+        ).hexdigest()
+        context['status_choices'] = Loan.LoanStatus.choices
+        # Current filters, to be kept in pagination links
+        context['filter_query'] = urlencode({
+            key: self.request.GET[key] for key in LOAN_FILTER_PARAMS if self.request.GET.get(key)
+        })
+        return context
+
+
+def parse_identifiers(text):
+    """Splits scanner / textarea input into single serial numbers or PKs."""
+    return [token for token in re.split(r'[\s,;]+', text) if token]
+
+
+# Loans with more items than this get the item table from the React panel instead of the template
+SERVER_RENDER_ITEM_LIMIT = 200
 
 
 class LoanDetailView(LoanPluginMixin, DetailView):
@@ -51,114 +164,497 @@ class LoanDetailView(LoanPluginMixin, DetailView):
     template_name = 'meinplugin/loan_detail.html'
     context_object_name = 'loan'
 
+    def get(self, request, *args, **kwargs):
+        try:
+            return super().get(request, *args, **kwargs)
+        except Http404:
+            # Old links (e.g. in the stock item history) to a loan which was archived since
+            if ArchivedLoan.objects.filter(pk=kwargs['pk']).exists():
+                return redirect('plugin:loan:loan_archive_detail', pk=kwargs['pk'])
+            raise
+
+    def get_item_panel_config(self):
+        """Configuration of the React item panel (URLs, CSRF token, loan state)."""
+        loan = self.object
+        return {
+            'loan': loan.pk,
+            'loan_open': loan.is_open,
+            'items_total': loan.items_total,
+            'items_url': reverse('plugin:loan:api_loan_items', kwargs={'pk': loan.pk}),
+            'issue_url': reverse('plugin:loan:api_loan_issue', kwargs={'pk': loan.pk}),
+            'return_url': reverse('plugin:loan:api_loan_return', kwargs={'pk': loan.pk}),
+            'location_search_url': reverse('plugin:loan:location_search'),
+            # '/0/' is replaced with the StockItem pk by the panel
+            'stock_item_url': StockItem(pk=0).get_absolute_url(),
+            'csrf_token': get_token(self.request),
+        }
+
+    @instrumented('view:LoanDetailView.get_context_data')
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        loan = self.object
+        # Prefix of the per-form idempotency keys of this page view
+        context['idempotency_key'] = idempotency.new_key()
+        # Background issue / return jobs which are still running (polled by the page)
+        context['open_jobs'] = list(
+            loan.jobs.filter(status__in=[LoanJob.JobStatus.QUEUED, LoanJob.JobStatus.RUNNING])
+        )
+
+        if loan.items_total > SERVER_RENDER_ITEM_LIMIT:
+            # Large loan: the React panel (frontend/src/LoanDetailPanel.tsx) loads the items
+            # from the JSON API in pages and renders only the visible rows
+            context['loaned_items'] = []
+            context['item_panel'] = self.get_item_panel_config()
+            context['item_panel_source'] = self.get_plugin().plugin_static_file('LoanDetailPanel.js')
+            return context
+
         # Add related items to the context
-        context['loaned_items'] = self.object.items.all().select_related('stock_item')
-        # Provide locations for the return form (simplified example)
-        context['return_locations'] = StockLocation.objects.filter(structural=False)
+        context['loaned_items'] = loan.items.all().select_related('stock_item')
+        # Closed loans without items on loan render no forms, so their item table is cached
+        context['cache_items'] = (
+            loan.status in (Loan.LoanStatus.RETURNED, Loan.LoanStatus.CANCELLED) and not loan.items_on_loan
+        )
+        context['fragment_cache_seconds'] = FRAGMENT_CACHE_SECONDS
+        context['loan_cache_version'] = loan_fragment_key(loan, get_loan_cache_version(loan.pk))
+        # Return locations are not rendered here, the page's location picker
+        # queries LocationSearchView lazily
         return context
 
     # --- Example: Handling Actions via POST requests ---
     # This is one way to handle actions like issuing or returning items
+
+    # POSTed 'action' -> handler method. Each one adds its messages for the user and
+    # returns True if the action was carried out (or handed to the background worker)
+    ACTION_HANDLERS = {
+        'issue_item': '_issue_item',
+        'return_item': '_return_item',
+        'issue_all': '_issue_all',
+        'return_selected': '_return_selected',
+        'add_item': '_add_items',
+    }
+
     def post(self, request, *args, **kwargs):
+        """Runs the POSTed 'action' on the loan and redirects back to it."""
         self.object = self.get_object() # Get the Loan object
+
+        handler = self.ACTION_HANDLERS.get(request.POST.get('action'))
+        if handler is None:
+            # Default: If action is unknown, show the detail page normally
+            return super().get(request, *args, **kwargs)
+        handler = getattr(self, handler)
         plugin = self.get_plugin()
-        action = request.POST.get('action')
-
-        # --- Action: Issue Pending Item ---
-        if action == 'issue_item':
-            item_pk = request.POST.get('item_pk')
-            if not item_pk:
-                # Handle error: No item specified
-                return redirect(self.object.get_absolute_url()) # Redirect back
-
-            item_to_issue = get_object_or_404(LoanedItem, pk=item_pk, loan=self.object)
-
-            # Check if item is actually pending
-            if item_to_issue.status == LoanedItem.ItemStatus.PENDING:
-                try:
-                    # Call the plugin's logic to perform the transfer
-                    plugin.issue_loan_item(item_to_issue, request.user)
-                    # Add success message (using Django messages framework)
-                except Exception as e:
-                    # Handle errors (log, show error message to user)
-                    print(f"Error issuing item {item_to_issue.pk}: {e}")
-                    # Add error message
-            else:
-                # Handle error: Item not in pending state
-                print(f"Cannot issue item {item_to_issue.pk}: Status is {item_to_issue.status}")
-                # Add warning message
 
+        # Every rendered form carries its own key: a double click or a resubmitted form
+        # commits the action only once (the key is claimed in the action's transaction)
+        key = request.POST.get('idempotency_key')
+        if not key:
+            handler(request, plugin)
             return redirect(self.object.get_absolute_url())
 
-        # --- Action: Return Item ---
-        elif action == 'return_item':
-            item_pk = request.POST.get('item_pk')
-            return_loc_pk = request.POST.get('return_location')
-
-            if not item_pk or not return_loc_pk:
-                 # Handle error: Missing data
-                 return redirect(self.object.get_absolute_url())
-
-            item_to_return = get_object_or_404(LoanedItem, pk=item_pk, loan=self.object)
-            return_location = get_object_or_404(StockLocation, pk=return_loc_pk)
-
-            # Check if item is actually on loan
-            if item_to_return.status == LoanedItem.ItemStatus.ON_LOAN:
-                 try:
-                     # Call the plugin's logic to perform the transfer back
-                     plugin.return_loan_item(item_to_return, return_location, request.user)
-                     # Add success message
-                 except Exception as e:
-                     # Handle errors
-                     print(f"Error returning item {item_to_return.pk}: {e}")
-                     # Add error message
-            else:
-                 # Handle error: Item not on loan
-                 print(f"Cannot return item {item_to_return.pk}: Status is {item_to_return.status}")
-                 # Add warning message
+        with transaction.atomic():
+            _record, created = idempotency.claim(request.user, key)
+            if not created:
+                messages.info(request, "This action was already processed.")
+            elif not handler(request, plugin):
+                # Nothing was done - release the key, so the form can be sent again
+                transaction.set_rollback(True)
+
+        return redirect(self.object.get_absolute_url())
+
+    def _issue_item(self, request, plugin):
+        """Issues a single pending item."""
+        item_pk = request.POST.get('item_pk')
+        if not item_pk:
+            return False
+
+        item_to_issue = get_object_or_404(LoanedItem, pk=item_pk, loan=self.object)
+
+        # Check if item is actually pending
+        if item_to_issue.status != LoanedItem.ItemStatus.PENDING:
+            messages.warning(request, f"Cannot issue item: status is {item_to_issue.get_status_display()}.")
+            return False
+
+        try:
+            plugin.issue_loan_item(item_to_issue, request.user)
+        except Exception as e:
+            logger.exception("LoanPlugin: error issuing item %s", item_to_issue.pk)
+            messages.error(request, f"Error issuing item: {e}")
+            return False
+        messages.success(request, "Item issued.")
+        return True
+
+    def _return_item(self, request, plugin):
+        """Returns a single item to the POSTed return location."""
+        item_pk = request.POST.get('item_pk')
+        return_loc_pk = request.POST.get('return_location')
+        if not item_pk or not return_loc_pk:
+            return False
+
+        item_to_return = get_object_or_404(LoanedItem, pk=item_pk, loan=self.object)
+        return_location = get_object_or_404(StockLocation, pk=return_loc_pk)
+
+        # Check if item is actually on loan
+        if item_to_return.status != LoanedItem.ItemStatus.ON_LOAN:
+            messages.warning(request, f"Cannot return item: status is {item_to_return.get_status_display()}.")
+            return False
+
+        try:
+            plugin.return_loan_item(item_to_return, return_location, request.user)
+        except Exception as e:
+            logger.exception("LoanPlugin: error returning item %s", item_to_return.pk)
+            messages.error(request, f"Error returning item: {e}")
+            return False
+        messages.success(request, "Item returned.")
+        return True
+
+    def _issue_all(self, request, plugin):
+        """Issues all pending items in one batch (or in the background for large loans)."""
+        pending_items = list(self.object.items.filter(status=LoanedItem.ItemStatus.PENDING))
+
+        # Large loans go to the background worker, the page polls the progress
+        if plugin.runs_in_background(len(pending_items)):
+            plugin.start_loan_job(self.object, LoanJob.Action.ISSUE, pending_items, request.user)
+            messages.info(request, f"Issuing {len(pending_items)} item(s) in the background.")
+            return True
+
+        try:
+            issued = plugin.issue_loan_items(pending_items, request.user)
+        except Exception as e:
+            logger.exception("LoanPlugin: error issuing items of loan %s", self.object.pk)
+            messages.error(request, f"Error issuing items: {e}")
+            return False
+        messages.success(request, f"{issued} item(s) issued.")
+        return True
+
+    def _return_selected(self, request, plugin):
+        """Returns the selected items in one batch (or in the background for many items)."""
+        item_pks = request.POST.getlist('item_pks')
+        return_loc_pk = request.POST.get('return_location')
+        if not item_pks or not return_loc_pk:
+            messages.warning(request, "Select at least one item and a return location.")
+            return False
+
+        return_location = get_object_or_404(StockLocation, pk=return_loc_pk)
+        items_to_return = list(self.object.items.filter(pk__in=item_pks, status=LoanedItem.ItemStatus.ON_LOAN))
+
+        if plugin.runs_in_background(len(items_to_return)):
+            plugin.start_loan_job(self.object, LoanJob.Action.RETURN, items_to_return, request.user, return_location)
+            messages.info(request, f"Returning {len(items_to_return)} item(s) in the background.")
+            return True
+
+        try:
+            returned = plugin.return_loan_items(items_to_return, return_location, request.user)
+        except Exception as e:
+            logger.exception("LoanPlugin: error returning items of loan %s", self.object.pk)
+            messages.error(request, f"Error returning items: {e}")
+            return False
+        messages.success(request, f"{returned} item(s) returned.")
+        return True
+
+    def _add_items(self, request, plugin):
+        """Adds items by serial number or PK (one per line, or separated by commas / spaces)."""
+        identifiers = parse_identifiers(request.POST.get('stock_items', ''))
+
+        # **Validation Needed Here:**
+        # Does the user have permission to move these items?
+
+        try:
+            added, errors = plugin.add_items_to_loan(self.object, identifiers)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return False
+
+        if added:
+            messages.success(request, f"{len(added)} item(s) added.")
+        for identifier, error in errors.items():
+            messages.warning(request, f"{identifier}: {error}")
+        return bool(added)
+
+
+class LoanAddItemsView(LoanPluginMixin, View):
+    """
+    Adds a batch of StockItems (serial numbers or PKs) to a loan.
+
+    POST JSON {"items": ["SN-1", "SN-2", 123]} or form data 'stock_items' (text)
+    -> {"added": [{"pk", "stock_item"}, ...], "errors": {"<identifier>": "<message>"}}
+    """
+
+    def post(self, request, *args, **kwargs):
+        loan = get_object_or_404(Loan, pk=kwargs['pk'])
+
+        if request.content_type == 'application/json':
+            try:
+                identifiers = json.loads(request.body).get('items', [])
+            except (ValueError, AttributeError):
+                return JsonResponse({'error': "Invalid JSON body"}, status=400)
+        else:
+            identifiers = parse_identifiers(request.POST.get('stock_items', ''))
+
+        try:
+            added, errors = self.get_plugin().add_items_to_loan(loan, identifiers)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse({
+            'added': [{'pk': item.pk, 'stock_item': item.stock_item_id} for item in added],
+            'errors': errors,
+        })
+
+
+class ReturnDeskView(LoanPluginMixin, View):
+    """
+    Continuous scan-to-return mode for the returns desk.
+
+    GET shows the scan page. POST JSON {"barcode": "..."} returns the scanned item to the
+    session's return location (or DEFAULT_RETURN_LOCATION); POST {"location": <pk>} sets
+    the session's return location.
+    """
+    template_name = 'meinplugin/return_desk.html'
+    session_key = 'loan_return_location'
+
+    def get(self, request, *args, **kwargs):
+        location = StockLocation.objects.filter(pk=request.session.get(self.session_key)).first()
+        return render(request, self.template_name, {'return_location': location})
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': "Invalid JSON body"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': "JSON body must be an object"}, status=400)
+
+        if 'location' in data:
+            try:
+                location_pk = int(data['location'])
+            except (TypeError, ValueError):
+                return JsonResponse({'error': "Invalid location"}, status=400)
+            location = StockLocation.objects.filter(pk=location_pk, structural=False).first()
+            if location is None:
+                return JsonResponse({'error': "Location not found"}, status=400)
+            request.session[self.session_key] = location.pk
+            return JsonResponse({'location': {'pk': location.pk, 'name': location.name}})
+
+        plugin = self.get_plugin()
+        loaned_item = plugin.find_loaned_item(data.get('barcode'))
+        if loaned_item is None:
+            return JsonResponse({'error': "No item on loan found for this barcode"}, status=404)
+
+        return_location = None
+        if request.session.get(self.session_key):
+            return_location = StockLocation.objects.filter(pk=request.session[self.session_key]).first()
+
+        result = plugin.return_scanned_item(loaned_item, request.user, return_location)
+        return JsonResponse(result, status=400 if 'error' in result else 200)
+
+
+class LoanArchiveView(LoanPluginMixin, ListView):
+    """
+    Read-only list of archived loans, newest first (always keyset paginated).
+
+    ?q= searches an exact serial number or loan ID, or the start of a reference or
+    customer name; ?customer=<pk> limits the list to one customer.
+    """
+    model = ArchivedLoan
+    template_name = 'meinplugin/loan_archive.html'
+    context_object_name = 'loans'
+    paginate_by = 25
+
+    def get_queryset(self):
+        queryset = ArchivedLoan.objects.defer('notes')
+
+        query = self.request.GET.get('q', '').strip()
+        if query:
+            # Serial lookup through the indexed item table, no join on the list query
+            condition = Q(pk__in=ArchivedLoanItem.objects.filter(serial=query).values('archived_loan_id'))
+            condition |= Q(reference__startswith=query) | Q(customer_name__istartswith=query)
+            if query.lstrip('#').isdigit():
+                condition |= Q(pk=int(query.lstrip('#')))
+            queryset = queryset.filter(condition)
+
+        if self.request.GET.get('customer'):
+            try:
+                queryset = queryset.filter(customer_id=int(self.request.GET['customer']))
+            except ValueError:
+                raise Http404("Invalid filter")
+
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        try:
+            self.cursor_page = paginator.page(self.request.GET.get('cursor'))
+        except ValueError:
+            raise Http404("Invalid cursor")
+        return (None, None, self.cursor_page.object_list, False)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_page'] = self.cursor_page
+        context['filter_query'] = urlencode({
+            key: self.request.GET[key] for key in ('q', 'customer') if self.request.GET.get(key)
+        })
+        return context
+
+
+class LoanArchiveDetailView(LoanPluginMixin, DetailView):
+    """Read-only view of one archived loan and its items."""
+    model = ArchivedLoan
+    template_name = 'meinplugin/loan_archive_detail.html'
+    context_object_name = 'loan'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['archived_items'] = self.object.items.order_by('pk')
+        return context
+
+
+class LoanExportView(LoanPluginMixin, View):
+    """
+    Streams the loan history (one row per LoanedItem) as CSV or XLSX.
+
+    GET ?format=csv|xlsx&status=&customer=&due_after=&due_before=&date_from=&date_to=
+    """
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'csv')
+        try:
+            rows = export.iter_rows(export.export_queryset(request.GET))
+        except (ValueError, TypeError):
+            return HttpResponseBadRequest("Invalid filter")
+
+        if file_format == 'csv':
+            response = StreamingHttpResponse(export.stream_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="loans.csv"'
+            return response
+
+        if file_format == 'xlsx':
+            try:
+                output = export.write_xlsx(rows)
+            except ImportError:
+                return HttpResponseBadRequest("XLSX export requires openpyxl")
+            return FileResponse(
+                output, as_attachment=True, filename='loans.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        return HttpResponseBadRequest(f"Unknown export format: {file_format}")
+
+
+class LoanImportView(LoanPluginMixin, View):
+    """Upload form for the CSV import of loans (staff only, see meinplugin/importer.py)."""
+    template_name = 'meinplugin/loan_import.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not request.user.is_staff:
+            return HttpResponseForbidden()
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return render(request, self.template_name, {})
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.error(request, "Please choose a CSV file.")
+            return render(request, self.template_name, {})
+
+        importer = LoanImporter(user=request.user, dry_run=bool(request.POST.get('dry_run')))
+        # Read the upload as a text stream, row by row
+        importer.run(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+
+        return render(request, self.template_name, {'importer': importer})
+
+
+class LoanJobProgressView(LoanPluginMixin, View):
+    """Lightweight JSON progress of a background issue / return job (polled by the detail page)."""
+
+    def get(self, request, *args, **kwargs):
+        job = (
+            LoanJob.objects.filter(pk=kwargs['job_pk'], loan_id=kwargs['pk'])
+            .values('status', 'action', 'total', 'processed', 'skipped', 'error').first()
+        )
+        if job is None:
+            raise Http404("Job not found")
+        return JsonResponse(job)
+
+
+class AvailabilityView(LoanPluginMixin, View):
+    """
+    Which serialized StockItems of a Part are free in a date range.
+
+    GET ?part=<pk>&start=YYYY-MM-DD&end=YYYY-MM-DD
+    -> {"results": [{"pk", "serial", "available", "loan"}, ...]}
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            part_pk = int(request.GET['part'])
+            start = date.fromisoformat(request.GET['start'])
+            end = date.fromisoformat(request.GET.get('end') or request.GET['start'])
+        except (KeyError, ValueError):
+            return JsonResponse({'error': "part, start and end (YYYY-MM-DD) are required"}, status=400)
+
+        if end < start:
+            return JsonResponse({'error': "end must not be before start"}, status=400)
+
+        return JsonResponse({'results': self.get_plugin().available_stock_items(part_pk, start, end)})
+
+
+class InstrumentationView(LoanPluginMixin, View):
+    """
+    Staff-only JSON dump of the instrumentation numbers (see instrumentation.py).
+
+    GET returns the aggregated numbers per view / operation, POST resets them.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not request.user.is_staff:
+            return HttpResponseForbidden()
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'stats': get_stats()})
+
+    def post(self, request, *args, **kwargs):
+        reset_stats()
+        return JsonResponse({'stats': {}})
 
-            return redirect(self.object.get_absolute_url())
 
-        # --- Action: Add Item (More complex - needs StockItem selection) ---
-        elif action == 'add_item':
-            stock_item_pk = request.POST.get('stock_item_pk')
-            if stock_item_pk:
-                 stock_item = get_object_or_404(StockItem, pk=stock_item_pk, serialized=True) # Ensure serialized
+class LocationSearchView(LoanPluginMixin, View):
+    """
+    JSON prefix search over non-structural StockLocations (for the return location picker).
 
-                 # **Validation Needed Here:**
-                 # 1. Is the stock_item available (correct location, not deleted, etc.)?
-                 # 2. Is it already part of *this* or another *active* loan?
-                 # 3. Does the user have permission to move this item?
+    GET ?q=<prefix>&limit=<n> -> {"results": [{"pk", "name", "pathstring"}, ...]}
+    """
+    default_limit = 20
+    max_limit = 50
+    cache_seconds = 60
 
-                 # If validation passes:
-                 try:
-                     LoanedItem.objects.create(
-                         loan=self.object,
-                         stock_item=stock_item,
-                         status=LoanedItem.ItemStatus.PENDING # Starts as pending
-                     )
-                     # Add success message
-                 except Exception as e: # Catch potential integrity errors etc.
-                     print(f"Error adding item {stock_item_pk} to loan {self.object.pk}: {e}")
-                     # Add error message
+    def get(self, request, *args, **kwargs):
+        term = request.GET.get('q', '').strip()
+        try:
+            limit = min(int(request.GET.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
 
-                 return redirect(self.object.get_absolute_url())
-            else:
-                 # Handle error: No stock item provided
-                 return redirect(self.object.get_absolute_url())
+        locations = StockLocation.objects.filter(structural=False)
+        if term:
+            locations = locations.filter(Q(name__istartswith=term) | Q(pathstring__istartswith=term))
 
+        results = list(locations.order_by('pathstring').values('pk', 'name', 'pathstring')[:max(limit, 1)])
 
-        # Default: If action is unknown or not POST, show the detail page normally
-        return super().get(request, *args, **kwargs)
+        response = JsonResponse({'results': results})
+        # Locations change rarely - let the browser reuse results while the user types
+        patch_cache_control(response, private=True, max_age=self.cache_seconds)
+        return response
 
 
 class LoanCreateView(LoanPluginMixin, CreateView):
     """View to create a new Loan."""
     model = Loan
     template_name = 'meinplugin/loan_form.html'
-    fields = ['customer', 'due_date', 'reference', 'notes'] # Fields editable by user
+    fields = ['customer', 'start_date', 'due_date', 'reference', 'notes'] # Fields editable by user
     # success_url = reverse_lazy('plugin:loan:loan_list') # Redirect to list after creation
 
     def get_success_url(self):